@@ -0,0 +1,178 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Batch Rendering
+#
+# python Saiko4/Batch.py <sheets, directories or globs>... [--jobs N]
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+if not __package__:
+    from Server import RENDER_OPTIONS, InitRenderWorker, RenderJob
+    from Synth import OSCILLATORS, PRECISIONS, SYNTH_ENGINE
+else:
+    from .Server import RENDER_OPTIONS, InitRenderWorker, RenderJob
+    from .Synth import OSCILLATORS, PRECISIONS, SYNTH_ENGINE
+
+# Times a sheet is rendered again after a worker died while rendering it
+BATCH_RETRIES = 1
+
+def FindSheets(patterns: list[str], recursive: bool = False):
+    # Project names (without `.sksheet`) of sheets, directories of sheets and globs.
+    sheets: list[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = glob.glob(os.path.join(glob.escape(pattern), '**' if recursive else '', '*.sksheet'), recursive=recursive)
+        elif os.path.exists(pattern) or os.path.exists(pattern + '.sksheet'):
+            paths = [pattern]
+        else:
+            paths = glob.glob(pattern, recursive=True)
+        for path in sorted(paths):
+            project = path[:-len('.sksheet')] if path.endswith('.sksheet') else path
+            if project not in sheets:
+                sheets.append(project)
+    return sheets
+
+def EstimateCost(project: str, compiled: bool = False):
+    # Size of the sheet file in bytes (about its notes), the sheet itself is only parsed by the workers.
+    if compiled and os.path.exists(project + '.skbin'):
+        return os.path.getsize(project + '.skbin')
+    return os.path.getsize(project + '.sksheet')
+
+def RenderBatch(sheets: list[str], workers: int = 1, options: dict[str, Any] | None = None, output_dir: str | None = None, cache_size: int = 256 << 20, cache_dir: str | None = None, cache_dir_size: int = 1 << 30, show_detail: bool = False):
+    # Renders every sheet (the most costly first), a failed sheet does not stop the others.
+    options = dict(RENDER_OPTIONS, **(options or {}))
+    start = time.perf_counter()
+    results: dict[str, dict[str, Any]] = {}
+    costs: dict[str, int] = {}
+    for sheet in sheets:
+        try:
+            costs[sheet] = EstimateCost(sheet, options['compiled'])
+        except Exception as error:
+            results[sheet] = {'state': 'failed', 'error': '{}: {}'.format(type(error).__name__, error)}
+            if show_detail:
+                print('Saiko Batch: [ERROR] {} failed, {}'.format(sheet, results[sheet]['error']))
+    pending = sorted(costs, key=lambda sheet: -costs[sheet])
+    retries = {sheet: 0 for sheet in pending}
+    running: dict[Future, str] = {}
+
+    def Collect(future: Future):
+        # Result of a finished sheet, False if its pool is broken.
+        sheet = running.pop(future)
+        try:
+            results[sheet] = dict(future.result(), state='done', cost=costs[sheet])
+        except BrokenProcessPool as error:
+            if retries[sheet] < BATCH_RETRIES:
+                # A worker died (maybe with another sheet), render it again in a new pool.
+                retries[sheet] += 1
+                pending.insert(0, sheet)
+                if show_detail:
+                    print('Saiko Batch: [WARNING] A worker died while rendering {}, rendering it again.'.format(sheet))
+                return False
+            results[sheet] = {'state': 'failed', 'error': 'BrokenProcessPool: {}'.format(error), 'cost': costs[sheet]}
+        except Exception as error:
+            results[sheet] = {'state': 'failed', 'error': '{}: {}'.format(type(error).__name__, error), 'cost': costs[sheet]}
+        if show_detail:
+            result = results[sheet]
+            if result['state'] == 'done':
+                print('Saiko Batch: {} done, {:.2f}s audio in {:.2f}s.'.format(sheet, result['audio_seconds'], result['seconds']))
+            else:
+                print('Saiko Batch: [ERROR] {} failed, {}'.format(sheet, result['error']))
+        return not isinstance(future.exception(), BrokenProcessPool)
+
+    def NewPool():
+        return ProcessPoolExecutor(workers, initializer=InitRenderWorker, initargs=(cache_size, cache_dir, cache_dir_size))
+
+    pool = NewPool()
+    try:
+        # Only `workers` sheets are submitted at once, so a dead worker only breaks the sheets being rendered.
+        # A sheet rendered again is rendered alone, so it can only break its own pool.
+        while len(pending) > 0 or len(running) > 0:
+            while len(pending) > 0 and len(running) < workers and not (retries[pending[0]] > 0 and len(running) > 0):
+                sheet = pending.pop(0)
+                output = sheet + '.wav' if output_dir is None else os.path.join(output_dir, os.path.basename(sheet) + '.wav')
+                running[pool.submit(RenderJob, sheet, output, options)] = sheet
+                if retries[sheet] > 0:
+                    break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            if not all([Collect(future) for future in done]):
+                # Every other sheet of the broken pool fails with it, then the rest go to a new pool.
+                for future in wait(running).done:
+                    Collect(future)
+                pool.shutdown(wait=False)
+                pool = NewPool()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    seconds = time.perf_counter() - start
+    done = [result for result in results.values() if result['state'] == 'done']
+    audio_seconds = sum(result['audio_seconds'] for result in done)
+    return {
+        'seconds': seconds,
+        'workers': workers,
+        'sheets': len(sheets),
+        'done': len(done),
+        'failed': len(results) - len(done),
+        'audio_seconds': audio_seconds,
+        # Rendered audio seconds per wall second
+        'throughput': audio_seconds / seconds if seconds > 0 else 0.0,
+        'results': {sheet: results[sheet] for sheet in sheets},
+    }
+
+def PrintSummary(summary: dict[str, Any]):
+    print('Saiko Batch: {:<40} {:>8} {:>10} {:>10} {:>8}'.format('Sheet', 'State', 'Audio', 'Time', 'Speed'))
+    for sheet, result in summary['results'].items():
+        if result['state'] == 'done':
+            print('Saiko Batch: {:<40} {:>8} {:>9.2f}s {:>9.2f}s {:>7.1f}x'.format(
+                sheet, 'done', result['audio_seconds'], result['seconds'], result['audio_seconds'] / result['seconds'] if result['seconds'] > 0 else 0.0))
+        else:
+            print('Saiko Batch: {:<40} {:>8}'.format(sheet, 'failed'))
+    print('Saiko Batch: {done}/{sheets} sheets ({failed} failed), {audio_seconds:.2f}s audio in {seconds:.2f}s with {workers} workers, {throughput:.1f}x real time.'.format(**summary))
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(prog='python Saiko4/Batch.py', description='Saiko batch rendering')
+    parser.add_argument('sheets', nargs='+', help='sheets (with or without suffix name), directories or globs')
+    parser.add_argument('--recursive', action='store_true', help='also find sheets in the sub-directories of directories')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--output-dir', default=None, help='save every result here instead of next to its sheet')
+    parser.add_argument('--engine', choices=list(SYNTH_ENGINE), default=None, help='synthesis engine of every sheet')
+    parser.add_argument('--oscillator', choices=list(OSCILLATORS), default=None, help='oscillator of the engine of every sheet')
+    parser.add_argument('--precision', choices=list(PRECISIONS), default=None, help='precision of the engine of every sheet')
+    parser.add_argument('--bandlimit', action='store_true', default=None, help='render the tracks of every sheet at the lowest rate that covers their partials')
+    parser.add_argument('--compiled', action='store_true', help='render from compiled sheets `.skbin`')
+    parser.add_argument('--stream', action='store_true', help='render and save block by block with bounded memory')
+    parser.add_argument('--cache-size', type=int, default=256, help='memory budget of the note cache of every worker in MiB')
+    parser.add_argument('--cache-dir', default=None, help='directory of the note cache shared by the workers')
+    parser.add_argument('--cache-dir-size', type=int, default=1024, help='size limit of `--cache-dir` in MiB')
+    parser.add_argument('--summary', default=None, help='save the summary as JSON')
+    args = parser.parse_args()
+    sheets = FindSheets(args.sheets, args.recursive)
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    summary = RenderBatch(
+        sheets, args.jobs, {'engine': args.engine, 'oscillator': args.oscillator, 'precision': args.precision, 'bandlimit': args.bandlimit, 'compiled': args.compiled, 'stream': args.stream}, args.output_dir,
+        args.cache_size << 20, args.cache_dir, args.cache_dir_size << 20, show_detail=True
+    )
+    PrintSummary(summary)
+    if args.summary is not None:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=1)
+    sys.exit(1 if summary['failed'] > 0 else 0)
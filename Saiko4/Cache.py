@@ -0,0 +1,189 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Cache of Synthesized Notes
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any
+import numpy as np
+
+def _FeedKey(h: Any, arg: Any):
+    # Every value is tagged by its kind, so that `[1.0]` and `1.0` are different keys.
+    if isinstance(arg, np.ndarray):
+        h.update(b'a' + arg.dtype.str.encode() + repr(arg.shape).encode())
+        h.update(np.ascontiguousarray(arg).tobytes())
+    elif isinstance(arg, (tuple, list)):
+        h.update(b'(' + str(len(arg)).encode())
+        for item in arg:
+            _FeedKey(h, item)
+        h.update(b')')
+    elif isinstance(arg, complex):
+        h.update(b'c' + repr(arg).encode())
+    elif isinstance(arg, (bool, int, float, np.integer, np.floating)):
+        # `1` and `1.0` give the same note.
+        h.update(b'f' + repr(float(arg)).encode())
+    else:
+        h.update(b's' + str(arg).encode())
+
+def NoteKey(*NoteArg: Any):
+    # Canonical hash of the resolved arguments of a note (see `SaikoSynthesizer.GetNote`).
+    h = blake2b(digest_size=16)
+    for arg in NoteArg:
+        _FeedKey(h, arg)
+    return h.hexdigest()
+
+class NoteCache(object):
+    # LRU cache of synthesized notes with a byte budget.
+    def __init__(self, max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__data: OrderedDict[str, np.ndarray[np.float32]] = OrderedDict()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def Get(self, key: str):
+        result = self.__data.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def Put(self, key: str, value: np.ndarray[np.float32]):
+        if value.nbytes > self.max_bytes:
+            return
+        if key in self.__data:
+            self.nbytes -= self.__data.pop(key).nbytes
+        # Evict the least recently used notes
+        while self.nbytes + value.nbytes > self.max_bytes:
+            _, evicted = self.__data.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+        # Cached notes are shared, so they must not be changed.
+        value.setflags(write=False)
+        self.__data[key] = value
+        self.nbytes += value.nbytes
+
+    def Clear(self):
+        self.__data.clear()
+        self.nbytes = 0
+
+    def Stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'notes': len(self.__data),
+            'bytes': self.nbytes,
+        }
+
+class DiskNoteCache(object):
+    # Synthesized notes stored as `.npy` files, can be shared by many processes.
+    # Files are written to a temporary name and renamed, so a reader never sees a partial file.
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.nbytes = sum(size for _, _, size in self.__ScanFiles())
+
+    def __Path(self, key: str):
+        return os.path.join(self.directory, key[:2], key + '.npy')
+
+    def __ScanFiles(self):
+        # (mtime, path, size) of every cached note
+        files: list[tuple[float, str, int]] = []
+        for sub_dir in os.scandir(self.directory):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith('.npy'):
+                    files.append((stat.st_mtime, entry.path, stat.st_size))
+                elif entry.name.endswith('.tmp') and time.time() - stat.st_mtime > 3600:
+                    # Left by a crashed process
+                    self.__Remove(entry.path)
+        return files
+
+    @staticmethod
+    def __Remove(path: str):
+        try:
+            os.remove(path)
+        except (FileNotFoundError, PermissionError):
+            # Removed by another process, or still mapped (Windows)
+            return False
+        return True
+
+    def Get(self, key: str):
+        path = self.__Path(key)
+        try:
+            result: np.ndarray[np.float32] = np.load(path, mmap_mode='r')
+            # Recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def Put(self, key: str, value: np.ndarray[np.float32]):
+        path = self.__Path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = '{}.{}-{}.tmp'.format(path, os.getpid(), threading.get_ident())
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(value, np.float32))
+        try:
+            os.replace(temp_path, path)
+        except PermissionError:
+            # Written and mapped by another process at the same time (Windows)
+            self.__Remove(temp_path)
+            return
+        self.nbytes += os.path.getsize(path)
+        if self.nbytes > self.max_bytes:
+            self.Evict()
+
+    def Evict(self):
+        # Remove the least recently used notes until 90% of the budget.
+        files = sorted(self.__ScanFiles())
+        self.nbytes = sum(size for _, _, size in files)
+        for _, path, size in files:
+            if self.nbytes <= self.max_bytes * 0.9:
+                break
+            if self.__Remove(path):
+                self.evictions += 1
+            self.nbytes -= size
+
+    def Stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'bytes': self.nbytes,
+        }
@@ -0,0 +1,241 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Real-time Playback
+#
+# A render thread synthesizes blocks ahead into a ring buffer, the playing thread drains it to a sink.
+
+import threading
+import time
+from typing import Any, Iterator
+import numpy as np
+import soundfile as sf
+
+class RingBuffer(object):
+    # Single producer / single consumer ring of samples without locks:
+    # only the producer moves `write_pos` and only the consumer moves `read_pos`.
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, np.float32)
+        self.write_pos = 0
+        self.read_pos = 0
+
+    def Available(self):
+        return self.write_pos - self.read_pos
+
+    def Free(self):
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def Write(self, samples: np.ndarray[np.float32]):
+        # Writes as many samples as there is room for, returns how many are written.
+        count = min(samples.size, self.Free())
+        begin = self.write_pos % self.capacity
+        first = min(count, self.capacity - begin)
+        self.data[begin: begin + first] = samples[:first]
+        self.data[:count - first] = samples[first: count]
+        self.write_pos += count
+        return count
+
+    def Read(self, out: np.ndarray[np.float32]):
+        # Reads up to `out.size` samples into `out`, returns how many are read.
+        count = min(out.size, self.Available())
+        begin = self.read_pos % self.capacity
+        first = min(count, self.capacity - begin)
+        out[:first] = self.data[begin: begin + first]
+        out[first: count] = self.data[:count - first]
+        self.read_pos += count
+        return count
+
+class AudioSink(object):
+    # Where the played samples go. `Write` blocks as long as the device needs to play the samples (if `realtime`).
+    realtime = True
+
+    def Open(self, sr: int, period: int):
+        pass
+
+    def Write(self, samples: np.ndarray[np.float32]):
+        # Returns True if the device ran out of samples before this write.
+        return False
+
+    def Close(self):
+        pass
+
+class NullSink(AudioSink):
+    # Drops the samples, but takes as long as a device would (or no time if not `realtime`).
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.samples = 0
+
+    def Open(self, sr: int, period: int):
+        self.sr = sr
+        self.start = time.perf_counter()
+
+    def Write(self, samples: np.ndarray[np.float32]):
+        self.samples += samples.size
+        if self.realtime:
+            # Wait until the device has played what it already had.
+            delay = self.start + (self.samples - samples.size) / self.sr - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return False
+
+class FileSink(NullSink):
+    # Saves the played samples (including the silence of underruns) as a sound file.
+    def __init__(self, path: str, subtype: str = 'PCM_16', realtime: bool = False):
+        super().__init__(realtime)
+        self.path = path
+        self.subtype = subtype
+
+    def Open(self, sr: int, period: int):
+        super().Open(sr, period)
+        self.file = sf.SoundFile(self.path, 'w', sr, 1, self.subtype)
+
+    def Write(self, samples: np.ndarray[np.float32]):
+        self.file.write(samples)
+        return super().Write(samples)
+
+    def Close(self):
+        self.file.close()
+
+class SoundDeviceSink(AudioSink):
+    # The default output device, needs the optional `sounddevice` module.
+    def __init__(self, device: Any = None, latency: str | float = 'low'):
+        import sounddevice
+        self.sounddevice = sounddevice
+        self.device = device
+        self.latency = latency
+
+    def Open(self, sr: int, period: int):
+        self.stream = self.sounddevice.OutputStream(sr, period, self.device, 1, 'float32', self.latency)
+        self.stream.start()
+
+    def Write(self, samples: np.ndarray[np.float32]):
+        return bool(self.stream.write(samples))
+
+    def Close(self):
+        self.stream.stop()
+        self.stream.close()
+
+def DefaultSink():
+    try:
+        return SoundDeviceSink()
+    except (ImportError, OSError):
+        return None
+
+class Player(object):
+    # Plays `blocks` (float32 in [-1, 1], louder samples are clipped) to `sink` while they are rendered.
+    #   period:         samples given to the sink at a time
+    #   buffer_seconds: size of the ring buffer, the render thread waits when it is full
+    #   prefill_seconds: rendered ahead before playing starts (playing also starts when rendering is done)
+    def __init__(self, blocks: Iterator[np.ndarray[np.float32]], sr: int, sink: AudioSink, period: int = 1024, buffer_seconds: float = 2.0, prefill_seconds: float = 0.25):
+        self.blocks = blocks
+        self.sr = sr
+        self.sink = sink
+        self.period = period
+        self.ring = RingBuffer(max(int(buffer_seconds * sr), 2 * period))
+        self.prefill = min(int(prefill_seconds * sr), self.ring.capacity)
+        self.done = False
+        self.stopped = False
+        self.error: BaseException | None = None
+        self.rendered = 0
+        # Seconds spent on rendering (not waiting for room in the ring buffer)
+        self.render_seconds = 0.0
+        self.played = 0
+        self.underruns = 0
+        self.underrun_samples = 0
+        self.margins: list[float] = []
+
+    def __Render(self):
+        try:
+            blocks = iter(self.blocks)
+            while True:
+                begin = time.perf_counter()
+                block = next(blocks, None)
+                self.render_seconds += time.perf_counter() - begin
+                if block is None:
+                    break
+                block = np.clip(block, -1.0, 1.0)
+                head = 0
+                while head < block.size:
+                    if self.stopped:
+                        return
+                    written = self.ring.Write(block[head:])
+                    head += written
+                    self.rendered += written
+                    if written == 0:
+                        time.sleep(self.period / self.sr / 4)
+        except BaseException as error:
+            self.error = error
+        finally:
+            self.done = True
+
+    def Stop(self):
+        self.stopped = True
+
+    def Play(self):
+        start = time.perf_counter()
+        render_thread = threading.Thread(target=self.__Render, name='Saiko-Render', daemon=True)
+        render_thread.start()
+        while not self.done and self.ring.Available() < self.prefill:
+            time.sleep(0.001)
+        latency = time.perf_counter() - start
+        self.sink.Open(self.sr, self.period)
+        out = np.zeros(self.period, np.float32)
+        try:
+            while not self.stopped:
+                # Render-ahead margin in seconds (what is buffered when a period is taken)
+                if not self.done:
+                    self.margins.append(self.ring.Available() / self.sr)
+                if not self.sink.realtime:
+                    # Nothing is late, so wait for the rendering.
+                    while not self.done and self.ring.Available() < self.period:
+                        time.sleep(0.001)
+                count = self.ring.Read(out)
+                underrun = False
+                if count < self.period:
+                    if self.done and self.ring.Available() == 0:
+                        if count > 0:
+                            self.sink.Write(out[:count])
+                            self.played += count
+                        break
+                    # Underrun: the rest of the period is silence.
+                    underrun = True
+                    self.underrun_samples += self.period - count
+                    out[count:] = 0.0
+                # The device may also run out of samples (if it is late).
+                if self.sink.Write(out) or underrun:
+                    self.underruns += 1
+                self.played += self.period
+        finally:
+            self.stopped = True
+            self.sink.Close()
+            render_thread.join()
+        if self.error is not None:
+            raise self.error
+        seconds = time.perf_counter() - start
+        return self.Report(latency, seconds)
+
+    def Report(self, latency: float, seconds: float):
+        margins = np.array(self.margins, np.float64)
+        return {
+            'latency': latency,
+            'seconds': seconds,
+            'audio_seconds': self.rendered / self.sr,
+            # Audio seconds rendered per second, faster than real time if > 1
+            'render_speed': self.rendered / self.sr / self.render_seconds if self.render_seconds > 0 else float('inf'),
+            'underruns': self.underruns,
+            'underrun_seconds': self.underrun_samples / self.sr,
+            'min_margin': float(margins.min()) if margins.size > 0 else 0.0,
+            'mean_margin': float(margins.mean()) if margins.size > 0 else 0.0,
+        }
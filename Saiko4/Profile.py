@@ -0,0 +1,108 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Render Telemetry
+
+import json
+import os
+import threading
+import time
+from typing import Any
+
+class RenderObserver(object):
+    # Receives every stage of a render (see `SaikoSynthesizer.Profile`).
+    # start and seconds are from `time.perf_counter`, samples is 0 if the stage has no samples.
+    def OnStage(self, name: str, start: float, seconds: float, samples: int, info: dict[str, Any]):
+        pass
+
+class Stage(object):
+    __slots__ = ('observer', 'name', 'samples', 'info', 'start')
+
+    def __init__(self, observer: RenderObserver, name: str, samples: int, info: dict[str, Any]):
+        self.observer = observer
+        self.name = name
+        self.samples = samples
+        self.info = info
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.observer.OnStage(self.name, self.start, time.perf_counter() - self.start, self.samples, self.info)
+
+class NullStage(object):
+    # Used when there is no observer, does nothing.
+    samples = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        pass
+
+    def __setattr__(self, name: str, value: Any):
+        pass
+
+NULL_STAGE = NullStage()
+
+class TraceRecorder(RenderObserver):
+    # Keeps every stage, saved as JSON or Chrome trace events (chrome://tracing, Perfetto).
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.events: list[tuple[str, float, float, int, dict[str, Any], int]] = []
+
+    def OnStage(self, name: str, start: float, seconds: float, samples: int, info: dict[str, Any]):
+        self.events.append((name, start - self.origin, seconds, samples, info, threading.get_ident()))
+
+    def Summary(self):
+        # Total time and samples of every stage, and of every voice.
+        summary: dict[str, dict[str, float | int]] = {}
+        for name, _, seconds, samples, info, _ in self.events:
+            keys = [name]
+            if 'voice' in info:
+                keys.append('{} <{}>'.format(name, info['voice']))
+            for key in keys:
+                item = summary.setdefault(key, {'count': 0, 'seconds': 0.0, 'samples': 0})
+                item['count'] += 1
+                item['seconds'] += seconds
+                item['samples'] += samples
+        return summary
+
+    def ChromeTrace(self):
+        return {
+            'traceEvents': [
+                {
+                    'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': seconds * 1e6,
+                    'pid': self.pid, 'tid': tid, 'args': dict(info, samples=samples),
+                }
+                for name, start, seconds, samples, info, tid in self.events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def Save(self, path: str, trace_format: str = 'chrome'):
+        if trace_format == 'chrome':
+            trace: dict[str, Any] = self.ChromeTrace()
+        else:
+            trace = {
+                'events': [
+                    {'name': name, 'start': start, 'seconds': seconds, 'samples': samples, 'info': info}
+                    for name, start, seconds, samples, info, _ in self.events
+                ],
+                'summary': self.Summary(),
+            }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
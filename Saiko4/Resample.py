@@ -0,0 +1,72 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Polyphase Upsampling
+#
+# Notes rendered at `sr / factor` (see `SaikoSynthesizer.NoteFactor`) are upsampled to `sr` by an integer factor
+# with a Kaiser-windowed sinc. Everything below `RESAMPLE_PASSBAND` of the low Nyquist is kept (within about -100 dB),
+# the images from `2 - RESAMPLE_PASSBAND` of it up are removed (below about -100 dB).
+
+from functools import lru_cache
+import numpy as np
+
+# Kept part of the Nyquist of the low rate, the highest partial of a note has to be below it
+RESAMPLE_PASSBAND: float = 0.8
+# Input samples on each side of an output sample, and the Kaiser window (about 100 dB with the transition band above)
+RESAMPLE_HALF_TAPS: int = 16
+RESAMPLE_BETA: float = 10.0
+
+@lru_cache(maxsize=None)
+def UpsampleTaps(factor: int, half_taps: int = RESAMPLE_HALF_TAPS, beta: float = RESAMPLE_BETA):
+    # taps[i, p]: weight of input `q + half_taps - i` for output `q * factor + p`.
+    n = np.arange(half_taps, -half_taps - 1, -1)[:, None] * factor + np.arange(factor)
+    window = np.i0(beta * np.sqrt(np.clip(1 - (n / (half_taps * factor + 1)) ** 2, 0.0, None))) / np.i0(beta)
+    taps = np.sinc(n / factor) * window
+    # Every phase has a gain of 1 (the phase 0 only has its center tap, so input samples are kept as they are).
+    taps /= taps.sum(axis=0)
+    taps = taps.astype(np.float32)
+    taps.flags.writeable = False
+    return taps
+
+class PolyphaseUpsampler(object):
+    # Streaming upsampler, `Process` returns `factor` samples for every input sample it can finish
+    # (the last `half_taps` are returned by `Flush`), so the output is not delayed.
+    def __init__(self, factor: int, half_taps: int = RESAMPLE_HALF_TAPS, beta: float = RESAMPLE_BETA):
+        self.factor = factor
+        self.half_taps = half_taps
+        self.taps = UpsampleTaps(factor, half_taps, beta)
+        # Samples before the first input are silence.
+        self.history = np.zeros(half_taps, np.float32)
+
+    def Process(self, samples: np.ndarray[np.float32]):
+        data = np.concatenate((self.history, np.asarray(samples, np.float32)))
+        width = 2 * self.half_taps + 1
+        if data.size < width:
+            self.history = data
+            return np.zeros(0, np.float32)
+        result = np.lib.stride_tricks.sliding_window_view(data, width) @ self.taps
+        self.history = data[data.size - width + 1:]
+        return result.reshape(-1)
+
+    def Flush(self):
+        # Samples after the last input are silence.
+        return self.Process(np.zeros(self.half_taps, np.float32))
+
+def Upsample(samples: np.ndarray[np.float32], factor: int, length: int | None = None):
+    # `samples` at `sr / factor` to `sr` (`factor * samples.size` samples, or the first `length` of them).
+    if factor == 1:
+        return samples[:length]
+    upsampler = PolyphaseUpsampler(factor)
+    result = np.concatenate((upsampler.Process(samples), upsampler.Flush()))
+    return result[:length]
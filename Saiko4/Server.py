@@ -0,0 +1,311 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Render Server
+#
+# Requests and responses are JSON lines over a Unix socket (or TCP on localhost):
+#   {"op": "render", "sheet": "<project>", "output": "<file>.wav", "options": {...}}  -> {"ok": true, "id": <job>}
+#   {"op": "status", "id": <job>}       -> {"ok": true, "job": {...}}
+#   {"op": "wait", "id": <job>}         -> {"ok": true, "job": {...}} (when the job is done or failed)
+#   {"op": "jobs"}                      -> {"ok": true, "jobs": [...]} (unfinished jobs and the last `SERVER_HISTORY` finished ones)
+#   {"op": "stats"}                     -> {"ok": true, "stats": {...}} (queue depth, workers, caches...)
+#   {"op": "shutdown"}                  -> {"ok": true}
+# Every worker process keeps its note cache, synth tables and the parsed sheets between jobs.
+
+import asyncio
+import json
+import os
+import socket
+import stat
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+if not __package__:
+    from SheetV2 import SaikoSynthesizer
+    from Synth import OSCILLATORS, PRECISIONS, SYNTH_ENGINE, SynthTables
+    from Cache import DiskNoteCache, NoteCache
+    from Table import SourceState
+else:
+    from .SheetV2 import SaikoSynthesizer
+    from .Synth import OSCILLATORS, PRECISIONS, SYNTH_ENGINE, SynthTables
+    from .Cache import DiskNoteCache, NoteCache
+    from .Table import SourceState
+
+# Options of a render job and their defaults
+RENDER_OPTIONS: dict[str, Any] = {
+    'engine': None,
+    'oscillator': None,
+    'precision': None,
+    'bandlimit': None,
+    'compiled': False,
+    'stream': False,
+    'stream_norm': 'peak',
+    'scratch': False,
+    'incremental': False,
+}
+# Parsed sheets kept by every worker
+SERVER_SHEETS = 16
+# Finished jobs kept by the server (older ones are dropped from `jobs`)
+SERVER_HISTORY = 1000
+
+_ServerCache: NoteCache | None = None
+_ServerDiskCache: DiskNoteCache | None = None
+_ServerTables: SynthTables | None = None
+_ServerSheets: OrderedDict[tuple, tuple[dict[str, Any], SaikoSynthesizer]] = OrderedDict()
+
+def InitRenderWorker(cache_size: int, cache_dir: str | None, cache_dir_size: int):
+    global _ServerCache, _ServerDiskCache, _ServerTables
+    _ServerCache = NoteCache(cache_size)
+    _ServerDiskCache = DiskNoteCache(cache_dir, cache_dir_size) if cache_dir is not None else None
+    _ServerTables = SynthTables()
+
+def _GetSynthesizer(sheet: str, options: dict[str, Any]):
+    # A parsed sheet is used again while its file is not changed.
+    key = (os.path.abspath(sheet), options['engine'], options['oscillator'], options['precision'], options['bandlimit'], options['compiled'])
+    source_path = sheet + '.sksheet'
+    state = SourceState(source_path, with_hash=False) if os.path.exists(source_path) else {}
+    if key in _ServerSheets and _ServerSheets[key][0] == state:
+        _ServerSheets.move_to_end(key)
+        return _ServerSheets[key][1], True
+    synth = SaikoSynthesizer(sheet, engine=options['engine'], cache_size=0, compiled=options['compiled'], oscillator=options['oscillator'], precision=options['precision'], bandlimit=options['bandlimit'])
+    # Windows and interpolated envelops / slides of this worker are shared by every sheet.
+    synth.Tables = _ServerTables
+    _ServerSheets[key] = (state, synth)
+    while len(_ServerSheets) > SERVER_SHEETS:
+        _ServerSheets.popitem(last=False)
+    return synth, False
+
+def RenderJob(sheet: str, output: str, options: dict[str, Any]):
+    start = time.perf_counter()
+    synth, reused = _GetSynthesizer(sheet, options)
+    # The caches of this worker are shared by every sheet (the keys have all the arguments of a note).
+    synth.NoteCache = _ServerCache
+    synth.DiskCache = _ServerDiskCache
+    synth.output_name = output
+    hits = _ServerCache.hits
+    result = synth(save=True, stream=options['stream'], stream_norm=options['stream_norm'], scratch=options['scratch'], incremental=options['incremental'])
+    if result is not None:
+        samples = result.size
+    else:
+        # Streamed, nothing is returned.
+        samples = max([synth.GetTrackLength(TrackNameIndex) for TrackNameIndex in range(len(synth.TrackNameList))], default=0)
+    return {
+        'pid': os.getpid(),
+        'seconds': time.perf_counter() - start,
+        'samples': int(samples),
+        'audio_seconds': samples / synth.SampleRate,
+        'sheet_reused': reused,
+        'cache_hits': _ServerCache.hits - hits,
+        'cache': _ServerCache.Stats(),
+    }
+
+class RenderServer(object):
+    def __init__(self, workers: int = 1, cache_size: int = 256 << 20, cache_dir: str | None = None, cache_dir_size: int = 1 << 30, show_detail: bool = False, history: int = SERVER_HISTORY):
+        self.workers = workers
+        self.history = history
+        self.pool_args = (cache_size, cache_dir, cache_dir_size)
+        self.show_detail = show_detail
+        self.pool = self.NewPool()
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.jobs: dict[int, dict[str, Any]] = {}
+        self.finished: dict[int, asyncio.Event] = {}
+        # Finished jobs in `jobs`, oldest first
+        self.finished_ids: deque[int] = deque()
+        # Every finished job (also the ones dropped from `jobs`)
+        self.totals: dict[str, Any] = {'done': 0, 'failed': 0, 'audio_seconds': 0.0, 'render_seconds': 0.0}
+        self.next_id = 1
+        self.start = time.time()
+        # Last cache stats of every worker process
+        self.worker_cache: dict[int, dict[str, int]] = {}
+
+    def NewPool(self):
+        return ProcessPoolExecutor(self.workers, initializer=InitRenderWorker, initargs=self.pool_args)
+
+    def Submit(self, sheet: str, output: str | None = None, options: dict[str, Any] | None = None):
+        options = dict(options or {})
+        unknown = [name for name in options if name not in RENDER_OPTIONS]
+        if len(unknown) > 0:
+            raise ValueError('Unknown options: ' + ', '.join(unknown))
+        if options.get('engine') is not None and options['engine'] not in SYNTH_ENGINE:
+            raise ValueError('Unknown engine: ' + str(options['engine']))
+        if options.get('oscillator') is not None and options['oscillator'] not in OSCILLATORS:
+            raise ValueError('Unknown oscillator: ' + str(options['oscillator']))
+        if options.get('precision') is not None and options['precision'] not in PRECISIONS:
+            raise ValueError('Unknown precision: ' + str(options['precision']))
+        if sheet.endswith('.sksheet'):
+            sheet = sheet[:-len('.sksheet')]
+        job_id = self.next_id
+        self.next_id += 1
+        self.jobs[job_id] = {
+            'id': job_id,
+            'sheet': sheet,
+            'output': output if output is not None else sheet + '.wav',
+            'options': dict(RENDER_OPTIONS, **options),
+            'state': 'queued',
+            'submitted': time.time(),
+            'started': None,
+            'finished': None,
+            'result': None,
+            'error': None,
+        }
+        self.finished[job_id] = asyncio.Event()
+        self.queue.put_nowait(job_id)
+        return job_id
+
+    def Stats(self):
+        states = [job['state'] for job in self.jobs.values()]
+        return {
+            'uptime': time.time() - self.start,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            **self.totals,
+            'worker_cache': {str(pid): stats for pid, stats in self.worker_cache.items()},
+        }
+
+    def Finish(self, job: dict[str, Any]):
+        job['finished'] = time.time()
+        self.totals[job['state']] += 1
+        if job['state'] == 'done':
+            self.totals['audio_seconds'] += job['result']['audio_seconds']
+            self.totals['render_seconds'] += job['result']['seconds']
+        self.finished[job['id']].set()
+        # Only the last `history` finished jobs are kept.
+        self.finished_ids.append(job['id'])
+        while len(self.finished_ids) > self.history:
+            job_id = self.finished_ids.popleft()
+            del self.jobs[job_id], self.finished[job_id]
+
+    async def Dispatch(self):
+        # One dispatcher for every worker process, so queued jobs stay in the queue (and its depth is right).
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs[job_id]
+            job['state'] = 'running'
+            job['started'] = time.time()
+            try:
+                result = await loop.run_in_executor(self.pool, RenderJob, job['sheet'], job['output'], job['options'])
+            except BrokenProcessPool as error:
+                # A worker died (the job is not retried), start another pool.
+                job['state'], job['error'] = 'failed', 'BrokenProcessPool: {}'.format(error)
+                self.pool.shutdown(wait=False)
+                self.pool = self.NewPool()
+            except Exception as error:
+                job['state'], job['error'] = 'failed', '{}: {}'.format(type(error).__name__, error)
+            else:
+                job['state'], job['result'] = 'done', result
+                self.worker_cache[result['pid']] = result['cache']
+            self.Finish(job)
+            if self.show_detail:
+                print('Saiko Server: Job {id} <{sheet}> {state} in {0:.3f}s.'.format(job['finished'] - job['started'], **job))
+
+    async def Request(self, request: dict[str, Any]):
+        op = request.get('op')
+        if op == 'render':
+            return {'ok': True, 'id': self.Submit(request['sheet'], request.get('output'), request.get('options'))}
+        if op in ('status', 'wait'):
+            job_id = int(request['id'])
+            if job_id not in self.jobs:
+                return {'ok': False, 'error': 'Unknown job: {}'.format(job_id)}
+            job = self.jobs[job_id]
+            if op == 'wait':
+                await self.finished[job_id].wait()
+            return {'ok': True, 'job': job}
+        if op == 'jobs':
+            return {'ok': True, 'jobs': list(self.jobs.values())}
+        if op == 'stats':
+            return {'ok': True, 'stats': self.Stats()}
+        if op == 'shutdown':
+            self.stopping.set()
+            return {'ok': True}
+        return {'ok': False, 'error': 'Unknown op: {}'.format(op)}
+
+    async def HandleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.Request(json.loads(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    response = {'ok': False, 'error': '{}: {}'.format(type(error).__name__, error)}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Client gone, or the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def Serve(self, path: str | None = None, host: str = '127.0.0.1', port: int = 0):
+        # Unix socket at `path` if it is given, else TCP on `host:port`.
+        if path is not None:
+            # Only a socket left by an earlier server is removed.
+            if os.path.exists(path):
+                if not stat.S_ISSOCK(os.stat(path).st_mode):
+                    raise FileExistsError('Path in use (not a socket): ' + path)
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.HandleClient, path)
+        else:
+            server = await asyncio.start_server(self.HandleClient, host, port)
+        dispatchers = [asyncio.create_task(self.Dispatch()) for _ in range(self.workers)]
+        if self.show_detail:
+            print('Saiko Server: Serving on {} with {} workers.'.format(path if path is not None else '{}:{}'.format(*server.sockets[0].getsockname()[:2]), self.workers))
+        try:
+            async with server:
+                await self.stopping.wait()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            if path is not None and os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+                os.remove(path)
+
+def Request(request: dict[str, Any], path: str | None = None, host: str = '127.0.0.1', port: int = 0):
+    # Sends one request to a render server and returns its response.
+    if path is not None:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(path)
+    else:
+        client = socket.create_connection((host, port))
+    with client, client.makefile('rwb') as f:
+        f.write(json.dumps(request).encode('utf-8') + b'\n')
+        f.flush()
+        return json.loads(f.readline())
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python Saiko4/Server.py', description='Saiko render server')
+    parser.add_argument('--socket', default=None, help='path of the Unix socket')
+    parser.add_argument('--host', default='127.0.0.1', help='host of the TCP server (if `--socket` is not given)')
+    parser.add_argument('--port', type=int, default=8765, help='port of the TCP server (if `--socket` is not given)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--cache-size', type=int, default=256, help='memory budget of the note cache of every worker in MiB')
+    parser.add_argument('--cache-dir', default=None, help='directory of the note cache shared by the workers')
+    parser.add_argument('--cache-dir-size', type=int, default=1024, help='size limit of `--cache-dir` in MiB')
+    parser.add_argument('--history', type=int, default=SERVER_HISTORY, help='finished jobs kept for `status` and `jobs`')
+    parser.add_argument('--request', default=None, help='send this request (JSON) to a running server and print the response')
+    args = parser.parse_args()
+    if args.request is not None:
+        print(json.dumps(Request(json.loads(args.request), args.socket, args.host, args.port), indent=1))
+    else:
+        server = RenderServer(args.workers, args.cache_size << 20, args.cache_dir, args.cache_dir_size << 20, show_detail=True, history=args.history)
+        asyncio.run(server.Serve(args.socket, args.host, args.port))
@@ -15,17 +15,35 @@
 # Main Of Saiko.
 
 
+import asyncio
 import json
+import os
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
 from typing import Any, Callable
 import numpy as np
 import soundfile as sf
 
-if __name__ == '__main__':
-    from Synth import SynthesisNote
+if not __package__:
+    from Synth import FFT_ERROR, OSCILLATOR_ENGINES, OSCILLATOR_ERROR, OSCILLATORS, PRECISIONS, SYNTH_ENGINE, SynthTables
+    from Cache import DiskNoteCache, NoteCache, NoteKey
+    from Profile import NULL_STAGE, RenderObserver, Stage, TraceRecorder
+    from Playback import AudioSink, DefaultSink, FileSink, NullSink, Player
+    from Resample import RESAMPLE_PASSBAND, Upsample
+    from Table import IsFresh, LoadTable, NoteTable, ReadHeader, ResolveSheet, SaveTable, SourceState
     from pitch import PITCH
     from Ver import SAIKO_VERSION
 else:
-    from .Synth import SynthesisNote
+    from .Synth import FFT_ERROR, OSCILLATOR_ENGINES, OSCILLATOR_ERROR, OSCILLATORS, PRECISIONS, SYNTH_ENGINE, SynthTables
+    from .Cache import DiskNoteCache, NoteCache, NoteKey
+    from .Profile import NULL_STAGE, RenderObserver, Stage, TraceRecorder
+    from .Playback import AudioSink, DefaultSink, FileSink, NullSink, Player
+    from .Resample import RESAMPLE_PASSBAND, Upsample
+    from .Table import IsFresh, LoadTable, NoteTable, ReadHeader, ResolveSheet, SaveTable, SourceState
     from .pitch import PITCH
     from .Ver import SAIKO_VERSION
 
@@ -34,19 +52,113 @@ SKSHEET = dict[str, Any]
 convert_pitch: Callable[[float], float] = lambda x : 2 ** (x / 12)
 convert_pitch_ex: Callable[[np.ndarray], np.ndarray] = lambda x : np.power(2, x / 12)
 
+# Min interval of progress messages in seconds
+PROGRESS_INTERVAL: float = 0.2
+# Note ranges per worker of `SynthesisParallel` (more ranges balance the workers better)
+SEGMENTS_PER_WORKER: int = 4
+# Max factor between the sheet's `sr` and the internal rate of a note with `bandlimit`
+MAX_BANDLIMIT_FACTOR: int = 8
+# Samples normalized and encoded at a time by `SaveSound`
+ENCODE_BLOCK: int = 1 << 18
+
+def EncodePCM(samples: np.ndarray[np.float32], subtype: str):
+    # The integers libsndfile writes for float samples with clipping on (as `soundfile` does):
+    # rint(x * 2 ** 31) clipped to int32, of which `PCM_16` keeps the top 16 bits (and libsndfile keeps the top 24 for `PCM_24`).
+    if subtype not in ('PCM_16', 'PCM_24', 'PCM_32'):
+        return samples
+    scaled = samples.astype(np.float64)
+    scaled *= 2.0 ** 31
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, -2.0 ** 31, 2.0 ** 31 - 1, out=scaled)
+    result = scaled.astype(np.int32)
+    if subtype == 'PCM_16':
+        return (result >> 16).astype(np.int16)
+    return result
+
 class SaikoSynthesizer(object):
-    def __init__(self, project_name: str, show_detail: bool = False):
+    def __init__(self, project_name: str, show_detail: bool = False, engine: str | None = None, cache_size: int = 256 << 20, cache_dir: str | None = None, cache_dir_size: int = 1 << 30, observer: RenderObserver | None = None, compiled: bool = False, oscillator: str | None = None, precision: str | None = None, bandlimit: bool | None = None):
         self.project_name = project_name
+        # Where the result is saved
+        self.output_name = project_name + '.wav'
         self.show_detail = show_detail
-        if self.show_detail:
-            print('Saiko Synthesis: Parsing Saiko Sheet...')
-        self.sksheet = self.OpenSkSheet(project_name)
+        self.engine = engine
+        self.oscillator = oscillator
+        self.precision = precision
+        self.bandlimit = bandlimit
+        # Receives the stages of the render (see `Profile.py`)
+        self.observer = observer
+        self.progress_time = 0.0
+        # Peak of the samples remixed by the last `SynthesisMix`
+        self.MixPeak = 0.0
+        # Rendered notes, `cache_size` is in bytes (0 to disable)
+        self.NoteCache = NoteCache(cache_size)
+        # Windows, ramps and interpolated envelops / slides shared by the notes
+        self.Tables = SynthTables()
+        # Rendered notes shared across runs
+        self.DiskCache = DiskNoteCache(cache_dir, cache_dir_size) if cache_dir is not None else None
+        # Every note of the sheet (resolved, or loaded from a compiled sheet `.skbin`)
+        self.Table: NoteTable | None = None
+        if compiled:
+            with self.Profile('OpenCompiledSheet'):
+                self.OpenCompiledSheet()
+        if self.Table is None:
+            if self.show_detail:
+                print('Saiko Synthesis: Parsing Saiko Sheet...')
+            with self.Profile('OpenSkSheet'):
+                self.sksheet = self.OpenSkSheet(project_name)
+        self.TrackNameList: list[str] = list(self.sksheet['Sheet']) if self.Table is None else self.Table.track_names
         if not self.CheckVersion(self.sksheet) and self.show_detail:
             print('Saiko Synthesis: [WARNING] The large version of the score is inconsistent with the large version of the synthesizer, which may cause compatibility issues.')
         self.VoiceDict = self.CollectVoice(self.sksheet)
+        self.VoiceName = {self.VoiceDict[name]: name for name in self.VoiceDict}
         self.EnvelopDict = self.GetEnvelop(self.sksheet)
         self.SlideDict = self.GetSlide(self.sksheet)
         self.GetSynthArg()
+        if self.Table is None:
+            if self.show_detail:
+                print('Saiko Synthesis: Resolving Notes...')
+            with self.Profile('ResolveSheet'):
+                self.Table = ResolveSheet(self)
+            if compiled:
+                self.CompileSheet()
+
+    def OpenCompiledSheet(self):
+        # Use `<project>.skbin` if it is still the same as `<project>.sksheet`.
+        path = self.project_name + '.skbin'
+        # A truncated or damaged file is not used (it is compiled again from `<project>.sksheet`).
+        try:
+            header = ReadHeader(path)
+            if os.path.exists(self.project_name + '.sksheet') and not IsFresh(header, self.project_name + '.sksheet', SAIKO_VERSION):
+                return
+            sksheet, Table = header['sksheet'], LoadTable(path, header)
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return
+        if self.show_detail:
+            print('Saiko Synthesis: Loading Compiled Sheet...')
+        self.sksheet, self.Table = sksheet, Table
+
+    def CompileSheet(self):
+        # Write `<project>.skbin`, so the notes are not resolved again.
+        if self.show_detail:
+            print('Saiko Synthesis: Compiling Saiko Sheet...')
+        with self.Profile('CompileSheet'):
+            SaveTable(
+                self.project_name + '.skbin', self.Table, {key: self.sksheet[key] for key in self.sksheet if key != 'Sheet'},
+                SourceState(self.project_name + '.sksheet'), SAIKO_VERSION
+            )
+
+    def Profile(self, name: str, samples: int = 0, **info: Any):
+        # with self.Profile(...) as stage: ... (`stage.samples` can be set inside)
+        if self.observer is None:
+            return NULL_STAGE
+        return Stage(self.observer, name, samples, info)
+
+    def PrintProgress(self, text: str, *args: Any):
+        # At most one message every `PROGRESS_INTERVAL` seconds.
+        now = time.perf_counter()
+        if now - self.progress_time >= PROGRESS_INTERVAL:
+            self.progress_time = now
+            print(text.format(*args), end=' '*16 + '\r')
 
     @staticmethod
     def OpenSkSheet(project_name:str):
@@ -107,6 +219,49 @@ class SaikoSynthesizer(object):
         self.window_size: int = SynthArg.get("window-length", self.SampleRate // 200)
         self.offset_of_window: int = SynthArg.get("offset", 4)
         self.norm: bool = SynthArg.get('norm', True)
+        if self.engine is None:
+            self.engine = SynthArg.get('engine', 'istft')
+        if self.engine not in SYNTH_ENGINE:
+            if self.show_detail:
+                print(f'Saiko Synthesis: [WARNING] Unknown synthesis engine `{self.engine}`, using `istft` instead.')
+            self.engine = 'istft'
+        self.SynthEngine = SYNTH_ENGINE[self.engine]
+        # Oscillator of the engine (see `Synth.OSCILLATORS`)
+        if self.oscillator is None:
+            self.oscillator = SynthArg.get('oscillator', 'exact')
+        self.oscillator_error: float = SynthArg.get('oscillator-error', OSCILLATOR_ERROR)
+        if self.oscillator not in OSCILLATORS:
+            if self.show_detail:
+                print(f'Saiko Synthesis: [WARNING] Unknown oscillator `{self.oscillator}`, using `exact` instead.')
+            self.oscillator = 'exact'
+        elif self.oscillator != 'exact' and self.engine not in OSCILLATOR_ENGINES:
+            if self.show_detail:
+                print(f'Saiko Synthesis: [WARNING] The `{self.engine}` engine has no `{self.oscillator}` oscillator, using `exact` instead.')
+            self.oscillator = 'exact'
+        # Precision of the engine (see `Synth.PRECISIONS`), `float64` for reference renders
+        if self.precision is None:
+            self.precision = SynthArg.get('precision', 'float32')
+        if self.precision not in PRECISIONS:
+            if self.show_detail:
+                print(f'Saiko Synthesis: [WARNING] Unknown precision `{self.precision}`, using `float32` instead.')
+            self.precision = 'float32'
+        # Arguments of the engine besides the note, and the name of the engine with them (in the keys of the caches)
+        self.EngineArgs: dict[str, Any] = {'precision': self.precision}
+        self.EngineKey = '{}/{}'.format(self.engine, self.precision)
+        if self.oscillator != 'exact':
+            self.EngineArgs.update(oscillator=self.oscillator, max_error=self.oscillator_error)
+            self.EngineKey = '{}/{}/{!r}/{}'.format(self.engine, self.oscillator, float(self.oscillator_error), self.precision)
+        elif self.engine == 'fft':
+            # Max error of every partial of the `fft` engine
+            fft_error: float = SynthArg.get('fft-error', FFT_ERROR)
+            self.EngineArgs.update(max_error=fft_error)
+            # (`/overlap`: the error is of the overlap-added frames, notes cached before are not reused)
+            self.EngineKey = '{}/{!r}/{}/overlap'.format(self.engine, float(fft_error), self.precision)
+        # Every note at the lowest rate that covers its partials, upsampled to `sr` (see `NoteFactor`).
+        if self.bandlimit is None:
+            self.bandlimit = SynthArg.get('bandlimit', False)
+        if self.bandlimit:
+            self.EngineKey += '/bandlimit'
         self.SavingFormat: str = self.sksheet.get('PCM', 'PCM_16')
         self.BeatPerMinute: float | None = self.sksheet.get('bpm', None)
         if self.BeatPerMinute != None:
@@ -144,49 +299,318 @@ class SaikoSynthesizer(object):
         block_num = NoteLength // (self.window_size // self.offset_of_window) + 1
         return (NoteLength, freqs, voice, volume, np.array(note_envelop, np.float32), convert_pitch_ex(np.array(note_slide, np.float32)), self.window_size, block_num, self.offset_of_window, self.SampleRate)
     
+    def GetNoteKey(self, NoteArg: tuple):
+        # Everything that changes the samples of a note.
+        return NoteKey(SAIKO_VERSION, self.EngineKey, self.norm, *NoteArg)
+
     def SynthNote(self, Note: dict[str, Any], local_track: dict[str, Any] = {}):
-        NoteArg = self.GetNote(Note, local_track)
+        with NULL_STAGE if self.observer is None else self.Profile('GetNote'):
+            NoteArg = self.GetNote(Note, local_track)
+        return self.SynthNoteArg(NoteArg)
+
+    def SynthNoteArg(self, NoteArg: tuple):
+        if len(NoteArg[1]) == 0:
+            return np.zeros(NoteArg[0], dtype=np.float32)
+        if self.observer is None:
+            # Without an observer nothing of the stage is built for every note.
+            return self.__SynthNoteArg(NoteArg)
+        with self.Profile('Note', NoteArg[0], voice=self.VoiceName.get(NoteArg[2], '?'), pitchs=len(NoteArg[1])):
+            NoteResult = self.__SynthNoteArg(NoteArg)
+        return NoteResult
+
+    def __SynthNoteArg(self, NoteArg: tuple):
         NoteResult = np.zeros(NoteArg[0], dtype=np.float32)
-        for freq in NoteArg[1]:
-            # Synthesis
-            temp_note_result = SynthesisNote(freq, *NoteArg[2:])
-            # Norm
-            if self.norm:
-                max_sample = np.max(np.abs(temp_note_result))
-                if max_sample > 0.015625:
-                    temp_note_result /= max_sample
-                temp_note_result *= NoteArg[3]
-            # Remix Note
-            NoteResult += temp_note_result[:NoteArg[0]]
+        # Cached Note
+        key = self.GetNoteKey(NoteArg)
+        CachedResult = self.NoteCache.Get(key)
+        if CachedResult is None and self.DiskCache is not None:
+            CachedResult = self.DiskCache.Get(key)
+            if CachedResult is not None:
+                self.NoteCache.Put(key, CachedResult)
+        if CachedResult is not None:
+            return CachedResult
+        # Synthesis (all pitches at once)
+        factor = 1
+        if self.bandlimit:
+            factor = self.NoteFactor(NoteArg)
+            temp_note_result = self.__SynthBandLimited(NoteArg, factor)
+        else:
+            temp_note_result = self.SynthEngine(NoteArg[1], *NoteArg[2:], tables=self.Tables, **self.EngineArgs)
+        # Norm
+        if self.norm:
+            # Peaks without a temporary of `abs`
+            max_sample = np.maximum(np.max(temp_note_result, axis=1), -np.min(temp_note_result, axis=1))
+            loud = max_sample > 0.015625
+            np.divide(temp_note_result, np.where(loud, max_sample, 1)[:, None], out=temp_note_result)
+            temp_note_result *= NoteArg[3]
+        # Remix Note
+        if factor > 1:
+            # At the internal rate, then upsampled to `sr`
+            InternalResult = np.zeros(temp_note_result.shape[1], np.float32)
+            for pitch_result in temp_note_result:
+                InternalResult += pitch_result
+            with NULL_STAGE if self.observer is None else self.Profile('Resample', NoteArg[0], factor=factor):
+                NoteResult = Upsample(InternalResult, factor, NoteArg[0])
+        else:
+            for pitch_result in temp_note_result:
+                NoteResult += pitch_result[:NoteArg[0]]
+        self.NoteCache.Put(key, NoteResult)
+        if self.DiskCache is not None:
+            self.DiskCache.Put(key, NoteResult)
         return NoteResult
     
-    def Synthesis(self):
+    def BandLimitVoice(self, freq: float, voice: tuple[tuple[float, complex], ...], slide: np.ndarray[np.float32]):
+        # Partials of `voice` at `freq` that stay below the Nyquist of the sheet (at the top of `slide`).
+        top = freq * float(np.max(slide))
+        return tuple(partial for partial in voice if abs(top * partial[0]) < self.SampleRate / 2)
+
+    def NoteFactor(self, NoteArg: tuple):
+        # Largest factor (up to `MAX_BANDLIMIT_FACTOR`) of `sr / factor`, the internal rate of a note with `bandlimit`,
+        # that keeps its highest partial (and the main lobe of the window around it) in the passband of the upsampling.
+        top = 0.0
+        slide_top = float(np.max(NoteArg[4]))
+        for freq in NoteArg[1]:
+            voice = self.BandLimitVoice(freq, NoteArg[2], NoteArg[4])
+            if len(voice) > 0:
+                top = max(top, abs(freq * slide_top) * max(abs(partial[0]) for partial in voice))
+        band = top + 2 * NoteArg[9] / NoteArg[6]
+        for factor in range(MAX_BANDLIMIT_FACTOR, 1, -1):
+            if NoteArg[9] % factor == 0 and NoteArg[6] % (factor * NoteArg[8]) == 0 and band < RESAMPLE_PASSBAND * NoteArg[9] / factor / 2:
+                return factor
+        return 1
+
+    def __SynthBandLimited(self, NoteArg: tuple, factor: int):
+        # The note at `sr / factor` (the same hops and blocks, so the envelop and slide are unchanged),
+        # pitches with the same partials below the Nyquist of the sheet are synthesized together.
+        # The overlap-add gain (sum of the window per hop) of the shorter window is scaled to the gain at `sr`.
+        gain = float(self.Tables.Window(NoteArg[6]).sum() / (factor * self.Tables.Window(NoteArg[6] // factor).sum())) if factor > 1 else 1.0
+        EngineArg = (NoteArg[3] * gain, NoteArg[4], NoteArg[5], NoteArg[6] // factor, NoteArg[7], NoteArg[8], NoteArg[9] // factor)
+        groups: dict[tuple[tuple[float, complex], ...], list[int]] = {}
+        for index, freq in enumerate(NoteArg[1]):
+            groups.setdefault(self.BandLimitVoice(freq, NoteArg[2], NoteArg[4]), []).append(index)
+        if len(groups) == 1 and len(next(iter(groups))) > 0:
+            return self.SynthEngine(NoteArg[1], next(iter(groups)), *EngineArg, tables=self.Tables, **self.EngineArgs)
+        result = np.zeros((len(NoteArg[1]), NoteArg[6] // factor // NoteArg[8] * NoteArg[7]), np.float32)
+        for voice, indexes in groups.items():
+            if len(voice) > 0:
+                result[indexes] = self.SynthEngine([NoteArg[1][index] for index in indexes], voice, *EngineArg, tables=self.Tables, **self.EngineArgs)
+        return result
+
+    def GetTrack(self, TrackName: str):
+        # Saiko 4.1+ will use track-configuration.
+        TrackData: list[dict[str, Any]] | dict[str, list[dict[str, Any]] | str | float | Any] = self.sksheet['Sheet'][TrackName]
+        if isinstance(TrackData, list):
+            return TrackData, {}
+        return TrackData['track'], TrackData
+
+    def TrackNoteCount(self, TrackNameIndex: int):
+        return int(self.Table.track_start[TrackNameIndex + 1] - self.Table.track_start[TrackNameIndex])
+
+    def TrackNoteArgs(self, TrackNameIndex: int, first: int = 0, last: int | None = None):
+        # Resolved arguments (same as `GetNote`) of every note of a track (or the notes `first` to `last` of it).
+        return self.Table.NoteArgs(TrackNameIndex, self.window_size, self.offset_of_window, self.SampleRate, first, last)
+
+    def PlanTrack(self, TrackNameIndex: int):
+        # Offset and length of every note of a track (no synthesis).
+        return self.Table.TrackPlan(TrackNameIndex)
+
+    def GetTrackLength(self, TrackNameIndex: int):
+        return int(np.sum(self.PlanTrack(TrackNameIndex)[1]))
+
+    def SplitTrack(self, TrackNameIndex: int, samples: int):
+        # Contiguous note ranges (first, last) of a track with about `samples` samples each.
+        NoteOffset, NoteLength = self.PlanTrack(TrackNameIndex)
+        length = int(np.sum(NoteLength))
+        parts = max(1, -(-length // max(samples, 1)))
+        # A range starts at the first note at or after its share of the samples.
+        bounds = np.unique(np.searchsorted(NoteOffset, np.arange(parts) * (length / parts)))
+        bounds = np.append(bounds, NoteOffset.size).tolist()
+        return [(first, last) for first, last in zip(bounds[:-1], bounds[1:]) if last > first]
+
+    def SynthTrack(self, TrackNameIndex: int, out: np.ndarray[np.float32] | None = None, remix: bool = False, first: int = 0, last: int | None = None, final_from: int | None = None):
+        # Writes (or adds if `remix`) the track to `out` if it is given.
+        # Only the notes `first` to `last` are synthesized, they are written at their own offsets of `out`.
+        # Samples of `out` from `final_from` on are not changed by later tracks, their peak goes to `MixPeak` as they are written.
+        TrackNameList = self.TrackNameList
+        NoteCount = self.TrackNoteCount(TrackNameIndex)
+        TrackResult: list[np.ndarray[np.float32]] = []
+        position = 0 if first == 0 else int(self.PlanTrack(TrackNameIndex)[0][first])
+        # Synth a Track
+        with self.Profile('Track', track=TrackNameList[TrackNameIndex]) as stage:
+            for NoteIndex, NoteArg in enumerate(self.TrackNoteArgs(TrackNameIndex, first, last), first):
+                if self.show_detail:
+                    self.PrintProgress('Saiko Synthesis: Synthesis {0}/{1} Tracks <{2}>, {3}/{4} Notes...', TrackNameIndex, len(TrackNameList), TrackNameList[TrackNameIndex], NoteIndex, NoteCount)
+                NoteResult = self.SynthNoteArg(NoteArg)
+                if out is None:
+                    TrackResult.append(NoteResult)
+                elif remix:
+                    out[position: position + NoteResult.size] += NoteResult
+                else:
+                    out[position: position + NoteResult.size] = NoteResult
+                if out is not None and final_from is not None:
+                    self.TrackPeak(out[max(position, final_from): position + NoteResult.size])
+                position += NoteResult.size
+            stage.samples = position
+        if out is not None:
+            return out
+        if len(TrackResult) == 0:
+            return np.zeros(0, np.float32)
+        return np.concatenate(TrackResult)
+
+    def FinalFrom(self, TrackLength: list[int]):
+        # Samples of a remix from which on no later track is added, for every track.
+        return [max(TrackLength[index + 1:], default=0) for index in range(len(TrackLength))]
+
+    def TrackPeak(self, samples: np.ndarray[np.float32]):
+        if samples.size > 0:
+            self.MixPeak = max(self.MixPeak, float(np.max(samples)), float(-np.min(samples)))
+
+    def Synthesis(self, workers: int = 1):
         if self.show_detail:
             print('Saiko Synthesis: Loading Track Data...')
-        # Saiko 4.1+ will use track-configuration.
-        Sheet: dict[str, list[Any] | dict[str, list[dict[str, Any]] | str | float | Any]] = self.sksheet['Sheet']
-        TrackNameList: list[str] = list(Sheet)
+        TrackNameList = self.TrackNameList
+        if workers > 1 and self.Table.notes.size > 1:
+            return self.SynthesisParallel(workers)
         AllTrackResult: list[np.ndarray[np.float32]] = [None] * len(TrackNameList)
         for TrackNameIndex in range(len(TrackNameList)):
-            TrackData: list[dict[str, Any]] | dict[str, list[dict[str, Any]] | str | float | Any] = Sheet[TrackNameList[TrackNameIndex]]
-            if isinstance(TrackData, list):
-                TrackResult: list[np.ndarray[np.float32]] = [None] * len(TrackData) # Please ignore this error.
-                # Synth a Track
-                for NoteIndex in range(len(TrackData)):
+            AllTrackResult[TrackNameIndex] = self.SynthTrack(TrackNameIndex)
+        return AllTrackResult
+
+    def SynthesisMix(self, workers: int = 1, scratch: bool = False):
+        # Remix every note straight into one preallocated buffer (not normalized), its peak is tracked in `MixPeak` meanwhile.
+        # If `scratch`, the buffer is a memory-mapped temporary file.
+        if self.show_detail:
+            print('Saiko Synthesis: Loading Track Data...')
+        TrackNameList = self.TrackNameList
+        TrackLength = [self.GetTrackLength(TrackNameIndex) for TrackNameIndex in range(len(TrackNameList))]
+        SoundLength = max(TrackLength, default=0)
+        self.MixPeak = 0.0
+        if self.show_detail:
+            print('Saiko Synthesis: {} Samples ({:.1f} MiB) To Remix.'.format(SoundLength, SoundLength * 4 / (1 << 20)))
+        if scratch and SoundLength > 0:
+            with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.project_name))) as f:
+                SoundResult = np.memmap(f, np.float32, 'w+', shape=(SoundLength, ))
+        else:
+            SoundResult = np.zeros(SoundLength, np.float32)
+        if workers > 1 and self.Table.notes.size > 1:
+            return self.SynthesisParallel(workers, SoundResult)
+        FinalFrom = self.FinalFrom(TrackLength)
+        for TrackNameIndex in range(len(TrackNameList)):
+            self.SynthTrack(TrackNameIndex, SoundResult, remix=True, final_from=FinalFrom[TrackNameIndex])
+        return SoundResult
+
+    def SynthesisParallel(self, workers: int, out: np.ndarray[np.float32] | None = None):
+        # Every track is split into note ranges of balanced sample counts (so a single long track is rendered in parallel too),
+        # the ranges are rendered by worker processes into the shared memory of their track at their own offsets.
+        # The tracks are added to `out` if it is given (and its peak is tracked in `MixPeak`).
+        TrackNameList = self.TrackNameList
+        TrackLength = [self.GetTrackLength(TrackNameIndex) for TrackNameIndex in range(len(TrackNameList))]
+        SegmentSamples = -(-sum(TrackLength) // (workers * SEGMENTS_PER_WORKER))
+        Segments = [(TrackNameIndex, first, last) for TrackNameIndex in range(len(TrackNameList)) for first, last in self.SplitTrack(TrackNameIndex, SegmentSamples)]
+        SharedTracks = [shared_memory.SharedMemory(create=True, size=max(length * 4, 1)) for length in TrackLength]
+        try:
+            with self.Profile('SynthesisParallel', sum(TrackLength), workers=workers, segments=len(Segments)), ProcessPoolExecutor(max(1, min(workers, len(Segments))), initializer=_InitWorker, initargs=(self, )) as pool:
+                futures = [pool.submit(_SynthTrackWorker, TrackNameIndex, SharedTracks[TrackNameIndex].name, TrackLength[TrackNameIndex], first, last) for TrackNameIndex, first, last in Segments]
+                for SegmentIndex, (TrackNameIndex, first, last) in enumerate(Segments):
+                    stats = futures[SegmentIndex].result()
+                    self.NoteCache.hits += stats['hits']
+                    self.NoteCache.misses += stats['misses']
+                    self.NoteCache.evictions += stats['evictions']
                     if self.show_detail:
-                        print(f'Saiko Synthesis: Synthesis {TrackNameIndex}/{len(TrackNameList)} Tracks <{TrackNameList[TrackNameIndex]}>, {NoteIndex}/{len(TrackData)} Notes...', end=' '*16 + '\r')
-                    Note = TrackData[NoteIndex]
-                    TrackResult[NoteIndex] = self.SynthNote(Note)
+                        self.PrintProgress('Saiko Synthesis: Synthesis {0}/{1} Segments <{2}> Done.', SegmentIndex + 1, len(Segments), TrackNameList[TrackNameIndex])
+            if out is not None:
+                FinalFrom = self.FinalFrom(TrackLength)
+                with self.Profile('Remix', out.size):
+                    for index in range(len(TrackNameList)):
+                        out[:TrackLength[index]] += np.ndarray((TrackLength[index], ), np.float32, SharedTracks[index].buf)
+                        self.TrackPeak(out[FinalFrom[index]: TrackLength[index]])
             else:
-                TrackResult: list[np.ndarray[np.float32]] = [None] * len(TrackData['track'])
-                # Synth a Track
-                for NoteIndex in range(len(TrackData['track'])):
-                    if self.show_detail:
-                        print('Saiko Synthesis: Synthesis {0}/{1} Tracks <{2}>, {3}/{4} Notes...'.format(TrackNameIndex, len(TrackNameList), TrackNameList[TrackNameIndex], NoteIndex, len(TrackData['track'])), end=' '*16 + '\r')
-                    Note = TrackData['track'][NoteIndex]
-                    TrackResult[NoteIndex] = self.SynthNote(Note, TrackData)
-            AllTrackResult[TrackNameIndex] = np.concatenate(TrackResult)
-        return AllTrackResult
+                AllTrackResult = [np.ndarray((TrackLength[index], ), np.float32, SharedTracks[index].buf).copy() for index in range(len(TrackNameList))]
+        finally:
+            for shm in SharedTracks:
+                shm.close()
+                shm.unlink()
+        return out if out is not None else AllTrackResult
+
+    def __getstate__(self):
+        # Rendered notes, tables and the observer are not sent to worker processes.
+        state = self.__dict__.copy()
+        state['NoteCache'] = NoteCache(self.NoteCache.max_bytes)
+        state['Tables'] = SynthTables(self.Tables.max_bytes)
+        state['observer'] = None
+        return state
+
+    def TrackBlocks(self, TrackNameIndex: int, block_size: int):
+        # Samples of a track in blocks of `block_size` (the last one may be shorter).
+        pending: list[np.ndarray[np.float32]] = []
+        pending_size = 0
+        for NoteArg in self.TrackNoteArgs(TrackNameIndex):
+            NoteResult = self.SynthNoteArg(NoteArg)
+            pending.append(NoteResult)
+            pending_size += NoteResult.size
+            if pending_size >= block_size:
+                samples = np.concatenate(pending)
+                head = 0
+                while samples.size - head >= block_size:
+                    yield samples[head: head + block_size]
+                    head += block_size
+                pending = [samples[head:]]
+                pending_size = samples.size - head
+        if pending_size > 0:
+            yield np.concatenate(pending)
+
+    def SynthesisBlocks(self, block_size: int = 1 << 16):
+        # Remixed (but not normalized) samples of all tracks, in time order.
+        streams = [self.TrackBlocks(TrackNameIndex, block_size) for TrackNameIndex in range(len(self.TrackNameList))]
+        position = 0
+        while len(streams) > 0:
+            block = np.zeros(block_size, np.float32)
+            block_length = 0
+            for stream in streams[:]:
+                samples = next(stream, None)
+                if samples is None:
+                    streams.remove(stream)
+                    continue
+                block[:samples.size] += samples
+                block_length = max(block_length, samples.size)
+            if block_length > 0:
+                position += block_length
+                if self.show_detail:
+                    self.PrintProgress('Saiko Synthesis: Streaming {:.2f}s...', position / self.SampleRate)
+                yield block[:block_length]
+
+    def StreamSound(self, block_size: int = 1 << 16, normalize: str = 'peak'):
+        # Render and save block by block, so only a few blocks are kept in memory.
+        # normalize: 'peak' keeps the remixed samples in a scratch file until the peak is known,
+        #            'two-pass' renders twice (the first pass only finds the peak),
+        #            'none' clips the samples instead.
+        if self.show_detail:
+            print('Saiko Synthesis: Streaming To {}...'.format(self.output_name))
+        peak = np.float32(0.0)
+        with self.Profile('StreamSound', normalize=normalize) as stage, sf.SoundFile(self.output_name, 'w', self.SampleRate, 1, self.SavingFormat) as f:
+            if normalize == 'peak':
+                with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.project_name))) as scratch:
+                    for block in self.SynthesisBlocks(block_size):
+                        peak = max(peak, np.max(np.abs(block)))
+                        scratch.write(block.tobytes())
+                    scratch.seek(0)
+                    while True:
+                        block = np.frombuffer(scratch.read(block_size * 4), np.float32)
+                        if block.size == 0:
+                            break
+                        f.write(block / peak if peak > 1.0 else block)
+            elif normalize == 'two-pass':
+                for block in self.SynthesisBlocks(block_size):
+                    peak = max(peak, np.max(np.abs(block)))
+                for block in self.SynthesisBlocks(block_size):
+                    if peak > 1.0:
+                        block /= peak
+                    f.write(block)
+            else:
+                for block in self.SynthesisBlocks(block_size):
+                    f.write(np.clip(block, -1.0, 1.0))
+            stage.samples = f.frames
+        return peak
     
     def RemixTracks(self, AllTrackResult: list[np.ndarray[np.float32]]):
         # Remix Tracks
@@ -196,52 +620,275 @@ class SaikoSynthesizer(object):
         SoundResult = np.zeros(max_sound_length, np.float32)
         if SoundResult.size == 0:
             return SoundResult
-        for track in AllTrackResult:
-            SoundResult[:track.size] += track
-        max_sound_sample = np.max(np.abs(SoundResult))
-        # Norm
-        if max_sound_sample > 1.0:
-            SoundResult /= max_sound_sample
+        with self.Profile('Remix', SoundResult.size):
+            for track in AllTrackResult:
+                SoundResult[:track.size] += track
+        return self.NormSound(SoundResult)
+
+    def NormSound(self, SoundResult: np.ndarray[np.float32], peak: float | None = None):
+        # `peak` of the samples if it is known (no scan)
+        if SoundResult.size == 0:
+            return SoundResult
+        with self.Profile('NormSound', SoundResult.size):
+            max_sound_sample = np.max(np.abs(SoundResult)) if peak is None else peak
+            # Norm
+            if max_sound_sample > 1.0:
+                SoundResult /= max_sound_sample
         return SoundResult
     
-    def SaveSound(self, SoundResult: np.ndarray[np.float32]):
+    def SaveSound(self, SoundResult: np.ndarray[np.float32], peak: float | None = None):
+        # Encoded block by block (without a full-size copy), normalized meanwhile by `peak` if it is over 1.
+        # Same file as `sf.write` of the (normalized) samples.
         if self.show_detail:
             print('Saiko Synthesis: Saving...')
-        sf.write(self.project_name + '.wav', SoundResult, self.SampleRate, self.SavingFormat)
+        with self.Profile('SaveSound', SoundResult.size), sf.SoundFile(self.output_name, 'w', self.SampleRate, 1, self.SavingFormat) as f:
+            for begin in range(0, SoundResult.size, ENCODE_BLOCK):
+                block = SoundResult[begin: begin + ENCODE_BLOCK]
+                if peak is not None and peak > 1.0:
+                    block = block / peak
+                f.write(EncodePCM(block, self.SavingFormat))
     
     def PlaySound(self):
         try:
             import winsound
         except:
-            print('Saiko Synthesis: [ERROR] Cannot Import `winsound` module. Playing the sound is not support yet.')
+            # Play the saved file through `sounddevice` instead.
+            sink = DefaultSink()
+            if sink is None:
+                print('Saiko Synthesis: [ERROR] Cannot Import `winsound` or `sounddevice` module. Playing the sound is not support yet.')
+                return
+            print('Saiko Synthesis: Playing Result...')
+            Player(sf.blocks(self.output_name, 1 << 14, dtype='float32'), self.SampleRate, sink).Play()
         else:
             print('Saiko Synthesis: Playing Result...')
-            winsound.PlaySound(self.project_name + '.wav', winsound.SND_FILENAME or winsound.SND_NODEFAULT or winsound.SND_ASYNC)
+            winsound.PlaySound(self.output_name, winsound.SND_FILENAME or winsound.SND_NODEFAULT or winsound.SND_ASYNC)
             input('(Press Enter To Exit.)')
 
-    def __call__(self, save: bool = True, play: bool = False):
-        tracks = self.Synthesis()
-        result = self.RemixTracks(tracks)
+    def PlayRealtime(self, sink: AudioSink | None = None, block_size: int = 4096, period: int = 1024, buffer_seconds: float = 2.0, prefill_seconds: float = 0.25):
+        # Play while rendering (blocks are rendered ahead on another thread), nothing is saved.
+        # Samples out of [-1, 1] are clipped since the peak is not known yet.
+        # Returns the report of `Player` (underruns and render-ahead margin).
+        if sink is None:
+            sink = DefaultSink()
+            if sink is None:
+                print('Saiko Synthesis: [ERROR] Cannot Import `sounddevice` module, nothing is played.')
+                sink = NullSink()
+        if self.show_detail:
+            print('Saiko Synthesis: Playing While Rendering...')
+        player = Player(self.SynthesisBlocks(block_size), self.SampleRate, sink, period, buffer_seconds, prefill_seconds)
+        with self.Profile('PlayRealtime') as stage:
+            report = player.Play()
+            stage.samples = player.rendered
+        if self.show_detail:
+            print('Saiko Synthesis: Played {audio_seconds:.2f}s (started after {latency:.3f}s), {underruns} underruns ({underrun_seconds:.3f}s).'.format(**report) + ' '*16)
+            print('Saiko Synthesis: Render-ahead margin {min_margin:.3f}s (min), {mean_margin:.3f}s (mean), rendering {render_speed:.2f}x real time.'.format(**report))
+        return report
+
+    async def SynthesisBlocksAsync(self, block_size: int = 1 << 16, executor: Executor | None = None):
+        # `SynthesisBlocks` for an event loop: every block is rendered in `executor` (the default executor of the loop if None).
+        # Cancelled (or closed) between blocks, the block being rendered is finished in the executor but no more.
+        loop = asyncio.get_running_loop()
+        blocks = self.SynthesisBlocks(block_size)
+        # `blocks` is used by one executor thread at a time.
+        lock = threading.Lock()
+        def Step():
+            with lock:
+                return next(blocks, None)
+        def Close():
+            with lock:
+                blocks.close()
+        try:
+            while True:
+                block = await loop.run_in_executor(executor, Step)
+                if block is None:
+                    break
+                yield block
+        finally:
+            loop.run_in_executor(executor, Close)
+
+    async def RenderAsync(self, save: bool = True, block_size: int = 1 << 16, executor: Executor | None = None):
+        # Same result as `self(save=save)`, but the event loop keeps running while rendering.
+        SoundLength = max([self.GetTrackLength(TrackNameIndex) for TrackNameIndex in range(len(self.TrackNameList))], default=0)
+        SoundResult = np.zeros(SoundLength, np.float32)
+        position = 0
+        async for block in self.SynthesisBlocksAsync(block_size, executor):
+            SoundResult[position: position + block.size] = block
+            position += block.size
+        loop = asyncio.get_running_loop()
+        SoundResult = await loop.run_in_executor(executor, self.NormSound, SoundResult)
         if save:
-            self.SaveSound(result)
-        if play:
-            self.PlaySound()
-        return result
+            await loop.run_in_executor(executor, self.SaveSound, SoundResult)
+        return SoundResult
 
-if __name__ == '__main__':
-    import sys
-    if len(sys.argv) > 1:
-        sksynth = SaikoSynthesizer(sys.argv[1], show_detail=True)
-        if len(sys.argv) == 3:
-            if sys.argv[2] == '--play':
-                sksynth(play=True)
+    def SynthesisIncremental(self):
+        # Like `SynthesisMix`, but only the notes changed since the last incremental render are synthesized.
+        # The last render is kept in `<project>.render/` (a manifest and the samples of every track).
+        render_dir = self.project_name + '.render'
+        manifest_path = os.path.join(render_dir, 'manifest.json')
+        # Changes of these settings invalidate the whole last render.
+        GlobalKey = NoteKey(SAIKO_VERSION, self.EngineKey, self.norm, self.SampleRate, self.A4_Frequency, json.dumps(self.sksheet.get('Synth', {}), sort_keys=True))
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                OldManifest: dict[str, Any] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            OldManifest = {}
+        OldTracks: dict[str, dict[str, Any]] = OldManifest.get('tracks', {}) if OldManifest.get('global') == GlobalKey else {}
+        os.makedirs(render_dir, exist_ok=True)
+        Manifest: dict[str, Any] = {'global': GlobalKey, 'tracks': {}}
+        TrackNameList = self.TrackNameList
+        AllTrackResult: list[np.ndarray[np.float32]] = [None] * len(TrackNameList)
+        reused, rendered = 0, 0
+        for TrackNameIndex in range(len(TrackNameList)):
+            TrackName = TrackNameList[TrackNameIndex]
+            NoteArgs = list(self.TrackNoteArgs(TrackNameIndex))
+            NoteKeys = [self.GetNoteKey(NoteArg) for NoteArg in NoteArgs]
+            NoteOffset = np.cumsum([0] + [NoteArg[0] for NoteArg in NoteArgs]).tolist()
+            TrackKey = NoteKey(NoteKeys, NoteOffset)
+            # Files are named by the track name, so a track never overwrites the last render of another one
+            # (tracks can be reordered or renamed between two renders).
+            track_path = os.path.join(render_dir, 'track-{}.npy'.format(NoteKey(TrackName)))
+            OldTrack = OldTracks.get(TrackName)
+            OldResult: np.ndarray[np.float32] | None = None
+            if OldTrack is not None and OldTrack['file'] == os.path.basename(track_path):
+                try:
+                    OldResult = np.load(track_path)
+                except (FileNotFoundError, ValueError):
+                    OldResult = None
+                if OldResult is not None and OldResult.size != OldTrack['length']:
+                    OldResult = None
+            if OldResult is not None and OldTrack['hash'] == TrackKey:
+                # Nothing changed
+                TrackResult = OldResult
+                reused += len(NoteArgs)
             else:
-                sksynth()
+                OldNotes = set(tuple(item) for item in OldTrack['notes']) if OldResult is not None else set()
+                TrackResult = np.zeros(NoteOffset[-1], np.float32)
+                for NoteIndex in range(len(NoteArgs)):
+                    begin, end = NoteOffset[NoteIndex], NoteOffset[NoteIndex + 1]
+                    if (begin, NoteKeys[NoteIndex]) in OldNotes:
+                        TrackResult[begin: end] = OldResult[begin: end]
+                        reused += 1
+                    else:
+                        if self.show_detail:
+                            self.PrintProgress('Saiko Synthesis: Synthesis {0}/{1} Tracks <{2}>, {3}/{4} Notes...', TrackNameIndex, len(TrackNameList), TrackName, NoteIndex, len(NoteArgs))
+                        TrackResult[begin: end] = self.SynthNoteArg(NoteArgs[NoteIndex])
+                        rendered += 1
+                with open(track_path + '.tmp', 'wb') as f:
+                    np.save(f, TrackResult)
+                os.replace(track_path + '.tmp', track_path)
+            AllTrackResult[TrackNameIndex] = TrackResult
+            Manifest['tracks'][TrackName] = {
+                'hash': TrackKey,
+                'file': os.path.basename(track_path),
+                'length': NoteOffset[-1],
+                'notes': [[NoteOffset[index], NoteKeys[index]] for index in range(len(NoteArgs))],
+            }
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(Manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+        # Renders of removed or renamed tracks
+        TrackFiles = set(track['file'] for track in Manifest['tracks'].values())
+        for file_name in os.listdir(render_dir):
+            if file_name.startswith('track-') and file_name.endswith('.npy') and file_name not in TrackFiles:
+                os.remove(os.path.join(render_dir, file_name))
+        if self.show_detail:
+            print('Saiko Synthesis: Incremental: {} Notes Reused, {} Notes Synthesized.'.format(reused, rendered) + ' '*16)
+        # Remix Tracks
+        SoundResult = np.zeros(max([track.size for track in AllTrackResult], default=0), np.float32)
+        for track in AllTrackResult:
+            SoundResult[:track.size] += track
+        return SoundResult
+
+    def PrintCacheStats(self):
+        print('Saiko Synthesis: Note Cache: {hits} hits, {misses} misses, {evictions} evictions.'.format(**self.NoteCache.Stats()) + ' '*16)
+        print('Saiko Synthesis: Synth Tables: {hits} hits, {misses} misses, {items} items.'.format(**self.Tables.Stats()))
+        if self.DiskCache is not None:
+            print('Saiko Synthesis: Disk Cache: {hits} hits, {misses} misses, {evictions} evictions.'.format(**self.DiskCache.Stats()))
+
+    def __call__(self, save: bool = True, play: bool = False, workers: int = 1, stream: bool = False, stream_norm: str = 'peak', scratch: bool = False, incremental: bool = False):
+        if stream:
+            # Always saved, nothing is returned.
+            self.StreamSound(normalize=stream_norm)
+            if self.show_detail:
+                self.PrintCacheStats()
+            if play:
+                self.PlaySound()
+            return None
+        if incremental:
+            result = self.SynthesisIncremental()
+            peak = None
         else:
-            sksynth()
-    else:
-        print('Saiko Synthesis: Usage: python Saiko4/Sheet.py <input-file-name-without-suffix-name>')
+            result = self.SynthesisMix(workers, scratch)
+            peak = self.MixPeak
+        if self.show_detail:
+            self.PrintCacheStats()
+        if scratch and save and not incremental:
+            # Normalized while it is saved, so the scratch file is only read once (nothing is returned).
+            self.SaveSound(result, peak)
+            result = None
+        else:
+            result = self.NormSound(result, peak)
+            if save:
+                self.SaveSound(result)
+        if play:
+            self.PlaySound()
+        return result
 
+_WorkerSynthesizer: SaikoSynthesizer | None = None
 
+def _InitWorker(synthesizer: SaikoSynthesizer):
+    global _WorkerSynthesizer
+    _WorkerSynthesizer = synthesizer
+    _WorkerSynthesizer.show_detail = False
+    _WorkerSynthesizer.observer = None
 
+def _SynthTrackWorker(TrackNameIndex: int, shm_name: str, length: int, first: int = 0, last: int | None = None):
+    # A worker renders many ranges, so only the counts of this one are returned.
+    before = _WorkerSynthesizer.NoteCache.Stats()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        _WorkerSynthesizer.SynthTrack(TrackNameIndex, np.ndarray((length, ), np.float32, shm.buf), first=first, last=last)
+    finally:
+        shm.close()
+    after = _WorkerSynthesizer.NoteCache.Stats()
+    return {name: after[name] - before[name] for name in ('hits', 'misses', 'evictions')}
 
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python Saiko4/SheetV2.py', description='Saiko Synthesis')
+    parser.add_argument('project', help='input file name without suffix name')
+    parser.add_argument('--play', action='store_true', help='play the result after saving')
+    parser.add_argument('--engine', choices=list(SYNTH_ENGINE), default=None, help='synthesis engine, overrides `engine` in the `Synth` block')
+    parser.add_argument('--oscillator', choices=list(OSCILLATORS), default=None, help='oscillator of the engine, overrides `oscillator` in the `Synth` block')
+    parser.add_argument('--precision', choices=list(PRECISIONS), default=None, help='precision of the engine, overrides `precision` in the `Synth` block (`float64` for reference renders)')
+    parser.add_argument('--bandlimit', action='store_true', default=None, help='render every note at the lowest rate that covers its partials and upsample it to `sr`, overrides `bandlimit` in the `Synth` block')
+    parser.add_argument('--cache-size', type=int, default=256, help='memory budget of the note cache in MiB (0 to disable)')
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes rendering note ranges of the tracks in parallel (a single track too)')
+    parser.add_argument('--stream', action='store_true', help='render and save block by block with bounded memory (`--jobs` is ignored)')
+    parser.add_argument('--stream-norm', choices=['peak', 'two-pass', 'none'], default='peak', help='normalization of `--stream`')
+    parser.add_argument('--scratch', action='store_true', help='remix in a memory-mapped temporary file instead of memory, normalized and encoded block by block while saving')
+    parser.add_argument('--incremental', action='store_true', help='only synthesize the notes changed since the last `--incremental` render (`--jobs` and `--scratch` are ignored)')
+    parser.add_argument('--profile', default=None, help='save the timing of every render stage to this file')
+    parser.add_argument('--profile-format', choices=['chrome', 'json'], default='chrome', help='`chrome` (trace events, for chrome://tracing or Perfetto) or `json`')
+    parser.add_argument('--cache-dir', default=None, help='directory of the note cache shared across runs')
+    parser.add_argument('--cache-dir-size', type=int, default=1024, help='size limit of `--cache-dir` in MiB')
+    parser.add_argument('--compile', action='store_true', help='only write the compiled sheet `<project>.skbin`')
+    parser.add_argument('--compiled', action='store_true', help='render from `<project>.skbin` (compiled again if the sheet is changed)')
+    parser.add_argument('--realtime', action='store_true', help='play while rendering, and report underruns and the render-ahead margin (nothing else is done)')
+    parser.add_argument('--sink', choices=['device', 'null', 'file'], default='device', help='output of `--realtime`: the sound device (needs `sounddevice`), nothing, or `<project>.wav` (both at real-time speed)')
+    args = parser.parse_args()
+    recorder = TraceRecorder() if args.profile is not None else None
+    if args.compile:
+        SaikoSynthesizer(args.project, show_detail=True, engine=args.engine, observer=recorder).CompileSheet()
+    elif args.realtime:
+        sksynth = SaikoSynthesizer(args.project, show_detail=True, engine=args.engine, cache_size=args.cache_size << 20, cache_dir=args.cache_dir, cache_dir_size=args.cache_dir_size << 20, observer=recorder, compiled=args.compiled, oscillator=args.oscillator, precision=args.precision, bandlimit=args.bandlimit)
+        sink = {'device': lambda: None, 'null': lambda: NullSink(), 'file': lambda: FileSink(args.project + '.wav', sksynth.SavingFormat, realtime=True)}[args.sink]()
+        sksynth.PlayRealtime(sink)
+    else:
+        sksynth = SaikoSynthesizer(args.project, show_detail=True, engine=args.engine, cache_size=args.cache_size << 20, cache_dir=args.cache_dir, cache_dir_size=args.cache_dir_size << 20, observer=recorder, compiled=args.compiled, oscillator=args.oscillator, precision=args.precision, bandlimit=args.bandlimit)
+        sksynth(play=args.play, workers=args.jobs, stream=args.stream, stream_norm=args.stream_norm, scratch=args.scratch, incremental=args.incremental)
+    if recorder is not None:
+        recorder.Save(args.profile, args.profile_format)
+        print('Saiko Synthesis: Profile:')
+        for name, item in sorted(recorder.Summary().items(), key=lambda item: -item[1]['seconds']):
+            print('    {:<32} {:>8} x {:>10.4f}s {:>12} Samples'.format(name, item['count'], item['seconds'], item['samples']))
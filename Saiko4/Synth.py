@@ -14,8 +14,94 @@
 
 # Core of Synthesis
 
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable
 import numpy as np
 
+# Max number of samples in one pass of batched synthesis.
+SYNTH_BATCH_SAMPLES: int = 1 << 20
+
+# Oscillators of `SynthThreadBatch` (how a * cos + b * sin of every frame is made)
+#   exact:    np.cos and np.sin in float64
+#   rotation: complex rotation, see `RotationOscillator`
+OSCILLATORS = ('exact', 'rotation')
+# Default max error of a non-exact oscillator (relative to the amplitude of a partial), under 1 LSB of 16-bit PCM.
+# Errors under about 1e-10 are not reachable (rounding of the phase), use `exact` instead.
+OSCILLATOR_ERROR: float = 1e-5
+# Max samples of a rotation recurrence before it starts again from an exact value
+ROTATION_BLOCK: int = 32
+
+# Precisions of the engines
+#   float32: the phase is float64 (reduced to [0, 2pi)), everything else is float32 and in place
+#   float64: all arithmetic in float64 (reference renders, same samples as before float32 was added)
+PRECISIONS = ('float32', 'float64')
+
+# Default max error of the `fft` engine (relative to the amplitude of a partial), about -80 dB.
+FFT_ERROR: float = 1e-4
+# Under this (by the precision of the bins), the kernel of a bin is evaluated directly instead of from the shared sines (no cancellation).
+FFT_KERNEL_EPSILON: dict[str, float] = {'float32': 3e-2, 'float64': 1e-3}
+
+class SynthTables(object):
+    # Arrays that only depend on the window, the length of a note and its envelop / slide, shared by the notes of a sheet.
+    # Envelops and slides are keyed by the array itself (the notes of a `NoteTable` share them) and the length.
+    # Cached arrays are read-only. `max_bytes` is 0 to disable.
+    def __init__(self, max_bytes: int = 64 << 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.__data: OrderedDict[tuple, tuple[Any, np.ndarray]] = OrderedDict()
+
+    def __Get(self, key: tuple, make: Callable[[], np.ndarray], source: Any = None):
+        item = self.__data.get(key)
+        if item is not None and item[0] is source:
+            self.__data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+        self.misses += 1
+        value = make()
+        if value.nbytes <= self.max_bytes:
+            while self.nbytes + value.nbytes > self.max_bytes:
+                _, (_, evicted) = self.__data.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            value.setflags(write=False)
+            # `source` is kept, so its id is not used by another array.
+            self.__data[key] = (source, value)
+            self.nbytes += value.nbytes
+        return value
+
+    def Window(self, window_size: int, dtype: Any = np.float64):
+        return self.__Get(('window', window_size, np.dtype(dtype).str), lambda: np.hanning(window_size).astype(dtype))
+
+    def Ramp(self, size: int):
+        return self.__Get(('ramp', size), lambda: np.arange(size))
+
+    def Grid(self, length: int, size: int):
+        # Where `length` samples fall on a curve of `size` points
+        return self.__Get(('grid', length, size), lambda: np.arange(length) / length * size)
+
+    def Interp(self, curve: np.ndarray, length: int, dtype: Any = np.float32):
+        # `curve` stretched to `length` samples
+        return self.__Get(
+            ('interp', id(curve), length, np.dtype(dtype).str),
+            lambda: np.interp(self.Grid(length, curve.size), self.Ramp(curve.size), curve).astype(dtype), curve
+        )
+
+    def BinPhase(self, window_size: int):
+        # (-1) ** (k + 1) * exp(-j * pi * k * (window_size - 1) / window_size) of every bin k of `np.fft.rfft`
+        def Make():
+            k = np.arange(window_size // 2 + 1)
+            return np.where(k % 2 == 1, 1.0, -1.0) * np.exp(-1j * np.pi * k * (window_size - 1) / window_size)
+        return self.__Get(('bin-phase', window_size), Make)
+
+    def Clear(self):
+        self.__data.clear()
+        self.nbytes = 0
+
+    def Stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'items': len(self.__data), 'bytes': self.nbytes}
+
 def SynthThread(freq: float, Amp: complex, window_size: int, block_num: int, volume: float, envelop: np.ndarray[np.float32], slide: np.ndarray[np.float32], sr: int = 64000):
     # Unknown
     UNIT_FREQ = 2 * np.pi / sr
@@ -39,7 +125,7 @@ def SynthThread(freq: float, Amp: complex, window_size: int, block_num: int, vol
             ) * volume
     return buffer[window_size // 2:] * real_envelop
 
-def SynthThreadV2(freq: float, Amp: complex, window_size: int, each_offset: int, SynthPointNum: int, volume: float, envelop: np.ndarray[np.float32], slide: np.ndarray[np.float32], sr: int = 64000):
+def SynthThreadV2Loop(freq: float, Amp: complex, window_size: int, each_offset: int, SynthPointNum: int, volume: float, envelop: np.ndarray[np.float32], slide: np.ndarray[np.float32], sr: int = 64000):
     # Unknown
     UNIT_FREQ = 2 * np.pi / sr
     WindowSampling = np.arange(window_size)
@@ -61,7 +147,130 @@ def SynthThreadV2(freq: float, Amp: complex, window_size: int, each_offset: int,
                 Amp.imag * np.sin(UNIT_FREQ * (WindowSampling + offset * each_offset) * real_freq[offset - 1])
             ) * volume
     return buffer[each_offset: each_offset + length] * real_envelop
-    
+
+def RotationOscillator(omega: np.ndarray[np.float64], start: np.ndarray[np.int64], Amps: np.ndarray[np.complex128], window_size: int, max_error: float = OSCILLATOR_ERROR):
+    # a * cos(omega * (n + start)) + b * sin(omega * (n + start)) for n < window_size, as Re(conj(A) * z ** (n + start)) with z = exp(j * omega).
+    # z ** n is a recurrence (products of z) in blocks of `step` samples, every block starts from an exact value, so the error does not grow.
+    # omega: (partial, hop, 1), start: (hop, ), Amps: (partial, 1, 1)
+    dtype = np.complex64 if max_error >= 8 * np.finfo(np.float32).eps else np.complex128
+    step = int(min(ROTATION_BLOCK, window_size, max(1, max_error // (4 * np.finfo(dtype).eps))))
+    block_num = -(-window_size // step)
+    # z ** k (k < step)
+    rotation = np.exp(1j * omega).astype(dtype)
+    inner = np.ones(omega.shape[:-1] + (step, ), dtype)
+    if step > 1:
+        np.cumprod(np.broadcast_to(rotation, omega.shape[:-1] + (step - 1, )), axis=-1, out=inner[..., 1:])
+    # conj(A) * z ** (start + block * step)
+    outer = (np.conj(Amps) * np.exp(1j * omega * (start[:, None] + np.arange(block_num) * step))).astype(dtype)
+    wave = outer.real[..., None] * inner.real[..., None, :] - outer.imag[..., None] * inner.imag[..., None, :]
+    return wave.reshape(omega.shape[:-1] + (block_num * step, ))[..., :window_size]
+
+def SynthThreadBatch(freqs: np.ndarray[np.float64], Amps: np.ndarray[np.complex128], window_size: int, each_offset: int, SynthPointNum: int, volume: float, envelop: np.ndarray[np.float32], slide: np.ndarray[np.float32], sr: int = 64000, oscillator: str = 'exact', max_error: float = OSCILLATOR_ERROR, tables: SynthTables | None = None, precision: str = 'float64'):
+    # `SynthThreadV2` of many partials at once, a row of the result is a partial.
+    if tables is None:
+        tables = SynthTables(0)
+    # Unknown
+    UNIT_FREQ = 2 * np.pi / sr
+    WindowSampling = tables.Ramp(window_size)
+    # Window
+    window = tables.Window(window_size)
+    # TotalLength
+    length = each_offset * SynthPointNum
+    # Envelop Interp
+    real_envelop = tables.Interp(envelop, length)
+    # Slide Interp
+    real_freq = tables.Interp(slide, SynthPointNum) * np.asarray(freqs, np.float32)[:, None]
+    # Amplitude
+    Amps = np.asarray(Amps, np.complex128)[:, None, None]
+    # A window covers `segment_num` hops
+    segment_num = -(-window_size // each_offset)
+    # Output (a row is a hop of a partial)
+    buffer = np.zeros((real_freq.shape[0], SynthPointNum + segment_num + 1, each_offset), dtype=np.float32)
+    # Hops per pass
+    chunk = max(1, SYNTH_BATCH_SAMPLES // (window_size * real_freq.shape[0]))
+    if precision == 'float32':
+        # Buffers of every pass
+        window32 = tables.Window(window_size, np.float32)
+        Amps32 = Amps.astype(np.complex64)
+        frame_buffer = np.empty((real_freq.shape[0], min(chunk, SynthPointNum), window_size), np.float32)
+        scratch_buffer = np.empty_like(frame_buffer)
+        phase_buffer = np.empty(frame_buffer.shape, np.float64) if oscillator == 'exact' else None
+    # Synth:
+    for start in range(1, SynthPointNum + 1, chunk):
+        offset = np.arange(start, min(start + chunk, SynthPointNum + 1))
+        if precision == 'float32':
+            frames = frame_buffer[:, :offset.size]
+            omega = UNIT_FREQ * real_freq[:, offset - 1, None].astype(np.float64)
+            if oscillator == 'exact':
+                # Phase in [0, 2pi), so float32 keeps its precision.
+                phase = phase_buffer[:, :offset.size]
+                np.multiply(omega, WindowSampling, out=phase)
+                phase += np.remainder(omega * (offset[:, None] * each_offset), 2 * np.pi)
+                np.remainder(phase, 2 * np.pi, out=phase)
+                scratch = scratch_buffer[:, :offset.size]
+                np.copyto(frames, phase, casting='same_kind')
+                np.sin(frames, out=scratch)
+                np.cos(frames, out=frames)
+                frames *= Amps32.real
+                scratch *= Amps32.imag
+                frames += scratch
+            else:
+                np.copyto(frames, RotationOscillator(omega, offset * each_offset, Amps, window_size, max_error), casting='same_kind')
+            frames *= window32
+            frames *= np.float32(volume)
+        elif oscillator == 'exact':
+            phase = UNIT_FREQ * (WindowSampling + offset[:, None] * each_offset) * real_freq[:, offset - 1, None]
+            frames = window * (Amps.real * np.cos(phase) + Amps.imag * np.sin(phase)) * volume
+        else:
+            omega = UNIT_FREQ * real_freq[:, offset - 1, None].astype(np.float64)
+            frames = window * RotationOscillator(omega, offset * each_offset, Amps, window_size, max_error) * volume
+        # Overlap-Add (keep the order of the hops)
+        for segment in range(segment_num - 1, -1, -1):
+            frame_segment = frames[:, :, segment * each_offset: (segment + 1) * each_offset]
+            buffer[:, start + segment: start + segment + offset.size, :frame_segment.shape[2]] += frame_segment
+    if precision == 'float32':
+        result = buffer[:, 1: SynthPointNum + 1].reshape(real_freq.shape[0], length)
+        result *= real_envelop
+        return result
+    return buffer[:, 1: SynthPointNum + 1].reshape(real_freq.shape[0], length) * real_envelop
+
+def SynthThreadV2(freq: float, Amp: complex, window_size: int, each_offset: int, SynthPointNum: int, volume: float, envelop: np.ndarray[np.float32], slide: np.ndarray[np.float32], sr: int = 64000):
+    # Same result as `SynthThreadV2Loop`, but all hops are synthesized in one pass.
+    return SynthThreadBatch(np.array([freq]), np.array([Amp]), window_size, each_offset, SynthPointNum, volume, envelop, slide, sr)[0]
+
+def SynthesisChord(
+    freqs: list[float] | np.ndarray[np.float64],
+    voice: tuple[tuple[float, complex], ...],
+    volume: float,
+    envelop: np.ndarray[np.float32],
+    slide: np.ndarray[np.float32],
+    window_size: int,
+    block_num: int,
+    offset_of_window: int = 4,
+    sr: int = 64000,
+    oscillator: str = 'exact',
+    max_error: float = OSCILLATOR_ERROR,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
+):
+    # `SynthesisNote` of every pitch of a chord, a row of the result is a pitch.
+    freqs = np.asarray(freqs, np.float64)
+    multiple = np.array([v[0] for v in voice])
+    Amp = np.array([v[1] for v in voice])
+    wave_length = window_size // offset_of_window * block_num
+    result = np.zeros((freqs.size, wave_length), np.float32)
+    # Partials per pass (pitch x partial rows of about `SYNTH_BATCH_SAMPLES` samples), so long notes with many partials stay small
+    chunk = max(1, SYNTH_BATCH_SAMPLES // (freqs.size * wave_length))
+    for start in range(0, multiple.size, chunk):
+        partials = SynthThreadBatch(
+            (freqs[:, None] * multiple[start: start + chunk]).reshape(-1), np.tile(Amp[start: start + chunk], freqs.size),
+            window_size, window_size // offset_of_window, block_num, volume, envelop, slide, sr, oscillator, max_error, tables, precision
+        ).reshape(freqs.size, -1, wave_length)
+        # Remix Partials
+        for index in range(partials.shape[1]):
+            result += partials[:, index]
+        del partials
+    return result
 
 def SynthesisNote(
     freq: float,
@@ -72,15 +281,261 @@ def SynthesisNote(
     window_size: int,
     block_num: int,
     offset_of_window: int = 4,
-    sr: int = 64000
+    sr: int = 64000,
+    oscillator: str = 'exact',
+    max_error: float = OSCILLATOR_ERROR,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
 ):
-    #wave_length = window_size // 2 * block_num
-    wave_length = window_size // offset_of_window * block_num
-    result = np.zeros(wave_length, np.float32)
-    for v in voice:
-        #result += SynthThread(freq * v[0], v[1], window_size, block_num, volume, envelop, slide, sr)
-        result += SynthThreadV2(freq * v[0], v[1], window_size, window_size // offset_of_window, block_num, volume, envelop, slide, sr)
+    return SynthesisChord([freq], voice, volume, envelop, slide, window_size, block_num, offset_of_window, sr, oscillator, max_error, tables, precision)[0]
+
+def SynthesisChordOscBank(
+    freqs: list[float] | np.ndarray[np.float64],
+    voice: tuple[tuple[float, complex], ...],
+    volume: float,
+    envelop: np.ndarray[np.float32],
+    slide: np.ndarray[np.float32],
+    window_size: int,
+    block_num: int,
+    offset_of_window: int = 4,
+    sr: int = 64000,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
+):
+    # Phase-accumulating oscillator bank. No window is used, `window_size` only keeps the same length and gain as `SynthesisChord`.
+    if tables is None:
+        tables = SynthTables(0)
+    UNIT_FREQ = 2 * np.pi / sr
+    freqs = np.asarray(freqs, np.float64)
+    each_offset = window_size // offset_of_window
+    wave_length = each_offset * block_num
+    # Overlap-Add Gain of `SynthesisChord`
+    gain = tables.Window(window_size).sum() / each_offset
+    # Envelop Interp
+    real_envelop = tables.Interp(envelop, wave_length)
+    # Slide Interp (per sample)
+    real_freq = tables.Interp(slide, wave_length, np.float64) * freqs[:, None]
+    # Instantaneous Phase (starts at the same phase as `SynthesisChord`)
+    phase = UNIT_FREQ * (np.cumsum(real_freq, axis=1) + real_freq[:, :1] * (each_offset - 1))
+    # Partials
+    multiple = np.array([v[0] for v in voice])[:, None]
+    Amp = np.array([v[1] for v in voice])[:, None]
+    result = np.zeros((freqs.size, wave_length), np.float32)
+    chunk = max(1, SYNTH_BATCH_SAMPLES // (len(voice) * freqs.size))
+    for start in range(0, wave_length, chunk):
+        partial_phase = multiple * phase[:, None, start: start + chunk]
+        if precision == 'float32':
+            # Phase in [0, 2pi), so float32 keeps its precision.
+            np.remainder(partial_phase, 2 * np.pi, out=partial_phase)
+            partial_phase = partial_phase.astype(np.float32)
+            wave = np.sin(partial_phase)
+            wave *= Amp.imag.astype(np.float32)
+            np.cos(partial_phase, out=partial_phase)
+            partial_phase *= Amp.real.astype(np.float32)
+            partial_phase += wave
+            np.sum(partial_phase, axis=1, out=result[:, start: start + chunk])
+        else:
+            result[:, start: start + chunk] = np.sum(Amp.real * np.cos(partial_phase) + Amp.imag * np.sin(partial_phase), axis=1)
+    result *= gain * volume
+    if precision == 'float32':
+        result *= real_envelop
+        return result
+    return result * real_envelop
+
+def SynthesisNoteOscBank(
+    freq: float,
+    voice: tuple[tuple[float, complex], ...],
+    volume: float,
+    envelop: np.ndarray[np.float32],
+    slide: np.ndarray[np.float32],
+    window_size: int,
+    block_num: int,
+    offset_of_window: int = 4,
+    sr: int = 64000,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
+):
+    return SynthesisChordOscBank([freq], voice, volume, envelop, slide, window_size, block_num, offset_of_window, sr, tables, precision)[0]
+
+@lru_cache(maxsize=None)
+def HannKernelBins(window_size: int, max_error: float = FFT_ERROR, each_offset: int | None = None):
+    # Bins on each side of a partial kept by `HannFrames`, so the error of a frame is under `max_error` (for any phase).
+    # The error is the frame of the dropped bins, measured for partials between two bins.
+    # With `each_offset`, the error is of the overlap-added frames (every frame with its largest error).
+    n = np.arange(window_size)
+    offset = np.linspace(0.0, 0.5, 21)
+    frames = np.hanning(window_size) * np.exp(2j * np.pi * (window_size // 4 + offset[:, None]) / window_size * n)
+    spectrum = np.fft.fft(frames, axis=-1)
+    # Distance of every bin from the partial (cyclic)
+    distance = np.abs((np.arange(window_size) - window_size // 4 + window_size // 2) % window_size - window_size // 2)
+    # At least the bins evaluated directly (see `_HannKernelTerm`)
+    for bins in range(3, window_size // 2):
+        error = np.abs(np.fft.ifft(np.where(distance > bins, spectrum, 0), axis=-1)).max(axis=0)
+        if each_offset is not None:
+            segment_num = -(-window_size // each_offset)
+            error = np.pad(error, (0, segment_num * each_offset - window_size)).reshape(segment_num, each_offset).sum(axis=0)
+        if error.max() <= max_error:
+            return bins
+    return max(3, window_size // 2)
+
+def _HannKernelTerm(beta: np.ndarray[np.float64], scale: np.ndarray[np.complex128], center: np.ndarray[np.int64], bins: int, window_size: int, real: np.ndarray, imag: np.ndarray, near: int | None = None):
+    # Adds scale * D(2pi * k / window_size - beta) / BinPhase[k] to (real, imag) at k = center - bins ... center + bins.
+    # With x = pi * k / window_size - beta / 2 = pi * j / window_size + y (j = k - center), it is
+    #   scale * exp(j * beta * (window_size - 1) / 2) * (-1) ** (k + 1) * sin(window_size * x) / sin(x)
+    # and (-1) ** (k + 1) * sin(window_size * x) = sin(window_size * beta / 2), so only sin(x) depends on the bin.
+    # Where sin(x) is small (only at j = near - 2 ... near + 2 if `near` is given), the bins are evaluated directly in float64.
+    # beta, scale, center: (partial, ), real, imag: (partial, 2 * bins + 1)
+    dtype = real.dtype
+    j = np.arange(-bins, bins + 1)
+    y = np.pi * center / window_size - 0.5 * beta
+    rotation = scale * np.exp(0.5j * (window_size - 1) * beta)
+    numerator = rotation * np.sin(0.5 * window_size * beta)
+    # sin(x) = sin(pi * j / window_size) * cos(y) + cos(pi * j / window_size) * sin(y)
+    denominator = np.multiply.outer(np.cos(y).astype(dtype), np.sin(np.pi * j / window_size).astype(dtype))
+    denominator += np.multiply.outer(np.sin(y).astype(dtype), np.cos(np.pi * j / window_size).astype(dtype))
+    if near is None:
+        direct = np.abs(denominator) < FFT_KERNEL_EPSILON[dtype.name]
+        row, col = np.nonzero(direct)
+        y_direct, center_direct, rotation_direct = y[row], center[row], rotation[row]
+    else:
+        direct = (slice(None), slice(bins + near - 2, bins + near + 3))
+        col = np.arange(bins + near - 2, bins + near + 3)
+        y_direct, center_direct, rotation_direct = y[:, None], center[:, None], rotation[:, None]
+    denominator[direct] = 1.0
+    np.reciprocal(denominator, out=denominator)
+    denominator[direct] = 0.0
+    real += numerator.real.astype(dtype)[:, None] * denominator
+    denominator *= numerator.imag.astype(dtype)[:, None]
+    imag += denominator
+    # sin(window_size * x) / sin(x), or its limit. x is about a multiple of pi here (the mirror of a partial at the Nyquist
+    # frequency is about pi), so it is reduced to x = m * pi + d first, sin(x) and sin(window_size * x) would only be rounding errors.
+    x = np.pi * j[col] / window_size + y_direct
+    m = np.rint(x / np.pi)
+    d = x - np.pi * m
+    sin_d = np.sin(d)
+    zero = sin_d == 0
+    sin_d[zero] = 1.0
+    ratio = np.sin(window_size * d)
+    ratio /= sin_d
+    ratio[zero] = window_size
+    # (-1) ** (m * (window_size - 1))
+    ratio *= np.where(m.astype(np.int64) * (window_size - 1) % 2 == 1, -1.0, 1.0)
+    # (-1) ** (k + 1)
+    ratio *= np.where(center_direct % 2 == 1, -1.0, 1.0) * np.where(j[col] % 2 == 1, 1.0, -1.0)
+    real[direct] += rotation_direct.real * ratio
+    imag[direct] += rotation_direct.imag * ratio
+
+def HannFrames(omega: np.ndarray[np.float64], C: np.ndarray[np.complex128], window_size: int, bins: int, tables: SynthTables, dtype: Any = np.float64):
+    # Frames sum(hanning * Re(C * exp(j * omega * n))) over the last axis (the partials), made by `np.fft.irfft` of their spectrums.
+    # The spectrum of a partial is the DTFT of the Hann window at the bins, as Dirichlet kernels
+    #   W(t) = 0.5 * D(t) - 0.25 * D(t - a) - 0.25 * D(t + a), a = 2pi / (window_size - 1)
+    #   D(t) = exp(-j * t * (window_size - 1) / 2) * sin(window_size * t / 2) / sin(t / 2)
+    #   X[k] = C / 2 * W(2pi * k / window_size - omega) + conj(C) / 2 * W(2pi * k / window_size + omega)
+    # only `bins` bins on each side of a partial are kept (see `HannKernelBins`).
+    # The bins away from a partial are summed in `dtype`, float32 is enough there (sin(x) is not small).
+    # omega, C: (..., partial)
+    shape = omega.shape[:-1]
+    frame_num = int(np.prod(shape))
+    half = window_size // 2
+    alpha = 2 * np.pi / (window_size - 1)
+    # Same samples at omega + 2pi, and at -omega with conj(C)
+    omega = np.remainder(omega, 2 * np.pi).reshape(-1)
+    C = C.reshape(-1)
+    flip = omega > np.pi
+    omega[flip] = 2 * np.pi - omega[flip]
+    C = np.where(flip, np.conj(C), C)
+    # (a partial at the Nyquist frequency of an odd window is between the bins `half` and `half + 1`, it is kept at `half`)
+    center = np.minimum(np.rint(omega * window_size / (2 * np.pi)).astype(np.int64), half)
+    real = np.zeros((omega.size, 2 * bins + 1), dtype)
+    imag = np.zeros((omega.size, 2 * bins + 1), dtype)
+    for weight, shift, near in ((0.5, 0.0, 0), (-0.25, alpha, 1), (-0.25, -alpha, -1)):
+        _HannKernelTerm(omega + shift, weight / 2 * C, center, bins, window_size, real, imag, near)
+    # The mirror (conj(C) at -omega) only reaches the kept bins of a partial near 0 or the Nyquist frequency.
+    mirror = np.nonzero((center <= bins + 2) | (center >= half - bins - 2))[0]
+    if mirror.size > 0:
+        mirror_real, mirror_imag = real[mirror], imag[mirror]
+        for weight, shift in ((0.5, 0.0), (-0.25, alpha), (-0.25, -alpha)):
+            _HannKernelTerm(shift - omega[mirror], weight / 2 * np.conj(C[mirror]), center[mirror], bins, window_size, mirror_real, mirror_imag)
+        real[mirror], imag[mirror] = mirror_real, mirror_imag
+    # Sum the partials of every frame into its spectrum (bins out of 0 ... half are dropped)
+    width = half + 1 + 2 * bins
+    slot = ((np.arange(frame_num).repeat(omega.size // max(frame_num, 1)) * width + center)[:, None] + np.arange(2 * bins + 1)).ravel()
+    spectrum = np.empty((frame_num, width), np.complex64 if dtype == np.float32 else np.complex128)
+    spectrum.real = np.bincount(slot, real.ravel(), frame_num * width).reshape(frame_num, width)
+    spectrum.imag = np.bincount(slot, imag.ravel(), frame_num * width).reshape(frame_num, width)
+    spectrum = spectrum[:, bins: bins + half + 1] * tables.BinPhase(window_size).astype(spectrum.dtype)
+    return np.fft.irfft(spectrum, window_size, axis=-1).reshape(shape + (window_size, ))
+
+def SynthesisChordFFT(
+    freqs: list[float] | np.ndarray[np.float64],
+    voice: tuple[tuple[float, complex], ...],
+    volume: float,
+    envelop: np.ndarray[np.float32],
+    slide: np.ndarray[np.float32],
+    window_size: int,
+    block_num: int,
+    offset_of_window: int = 4,
+    sr: int = 64000,
+    max_error: float = FFT_ERROR,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
+):
+    # Same frames as `SynthesisChord` (within `max_error` of every partial), but a frame is built as a spectrum (see `HannFrames`),
+    # so a partial costs a few bins instead of `window_size` samples of cos and sin.
+    if tables is None:
+        tables = SynthTables(0)
+    UNIT_FREQ = 2 * np.pi / sr
+    freqs = np.asarray(freqs, np.float64)
+    multiple = np.array([v[0] for v in voice])
+    Amp = np.array([v[1] for v in voice], np.complex128)
+    each_offset = window_size // offset_of_window
+    length = each_offset * block_num
+    bins = HannKernelBins(window_size, max_error, each_offset)
+    dtype = np.float32 if precision == 'float32' else np.float64
+    # Envelop Interp
+    real_envelop = tables.Interp(envelop, length)
+    # Slide Interp (pitch, partial, hop), same as `SynthThreadBatch`
+    real_freq = (tables.Interp(slide, block_num) * (freqs[:, None] * multiple).astype(np.float32)[..., None]).reshape(freqs.size, multiple.size, block_num)
+    segment_num = -(-window_size // each_offset)
+    buffer = np.zeros((freqs.size, block_num + segment_num + 1, each_offset), dtype=np.float32)
+    # Hops per pass
+    chunk = max(1, SYNTH_BATCH_SAMPLES // (freqs.size * multiple.size * (2 * bins + 1)))
+    for start in range(1, block_num + 1, chunk):
+        offset = np.arange(start, min(start + chunk, block_num + 1))
+        # (pitch, hop, partial)
+        omega = UNIT_FREQ * real_freq[:, :, offset - 1].transpose(0, 2, 1).astype(np.float64)
+        C = np.conj(Amp) * np.exp(1j * omega * (offset * each_offset)[:, None])
+        frames = HannFrames(omega, C, window_size, bins, tables, dtype)
+        frames *= volume
+        # Overlap-Add (keep the order of the hops)
+        for segment in range(segment_num - 1, -1, -1):
+            frame_segment = frames[:, :, segment * each_offset: (segment + 1) * each_offset]
+            buffer[:, start + segment: start + segment + offset.size, :frame_segment.shape[2]] += frame_segment
+    result = buffer[:, 1: block_num + 1].reshape(freqs.size, length)
+    result *= real_envelop
     return result
 
+def SynthesisNoteFFT(
+    freq: float,
+    voice: tuple[tuple[float, complex], ...],
+    volume: float,
+    envelop: np.ndarray[np.float32],
+    slide: np.ndarray[np.float32],
+    window_size: int,
+    block_num: int,
+    offset_of_window: int = 4,
+    sr: int = 64000,
+    max_error: float = FFT_ERROR,
+    tables: SynthTables | None = None,
+    precision: str = 'float64'
+):
+    return SynthesisChordFFT([freq], voice, volume, envelop, slide, window_size, block_num, offset_of_window, sr, max_error, tables, precision)[0]
 
+# Engines that take `oscillator` and `max_error`
+OSCILLATOR_ENGINES = ('istft', )
 
+SYNTH_ENGINE = {
+    'istft': SynthesisChord,
+    'oscbank': SynthesisChordOscBank,
+    'fft': SynthesisChordFFT,
+}
@@ -0,0 +1,263 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Columnar Note Table and Compiled Saiko Sheet (.skbin)
+#
+# .skbin file:
+#   SKBIN_MAGIC, header length (uint64, little-endian), header (JSON), arrays (each aligned to 64 bytes)
+# The header keeps the sheet without its notes, the source file state and where every array is.
+
+import json
+import os
+import struct
+from hashlib import blake2b
+from typing import Any, Iterator
+import numpy as np
+
+if not __package__:
+    from pitch import PITCH
+else:
+    from .pitch import PITCH
+
+SKBIN_MAGIC = b'SKBIN\x00'
+SKBIN_VERSION = 1
+SKBIN_ALIGN = 64
+
+NOTE_DTYPE = np.dtype([
+    ('length', '<i8'),
+    ('volume', '<f8'),
+    ('voice', '<i4'),
+    ('envelop', '<i4'),
+    ('slide', '<i4'),
+    ('freq_count', '<i4'),
+])
+PARTIAL_DTYPE = np.dtype([
+    ('multiple', '<f8'),
+    ('amp', '<c16'),
+])
+
+class NoteTable(object):
+    # Every note of a sheet as columns, voices, envelops and slides are interned into shared tables.
+    #   notes:          NOTE_DTYPE, one row per note, the notes of a track are contiguous
+    #   track_start:    first note of every track (and the end of the last track)
+    #   freqs:          frequencies of every note, `freq_count` for each note in order
+    #   partials:       PARTIAL_DTYPE, partials of every voice, voice_start gives the range of a voice
+    #   envelop_data:   every envelop, envelop_start gives the range of an envelop
+    #   slide_data:     every slide (already converted to frequency ratios), slide_start gives the range of a slide
+    ARRAYS = ('notes', 'track_start', 'freqs', 'partials', 'voice_start', 'envelop_data', 'envelop_start', 'slide_data', 'slide_start')
+
+    def __init__(self, arrays: dict[str, np.ndarray], track_names: list[str], voice_names: list[str]):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.track_names = track_names
+        self.voice_names = voice_names
+        # Shared objects, so notes of the same voice / envelop / slide use the same one.
+        self.Voices: list[tuple[tuple[float, complex], ...]] = [
+            tuple(zip(self.partials['multiple'][begin: end].tolist(), self.partials['amp'][begin: end].tolist()))
+            for begin, end in zip(self.voice_start[:-1].tolist(), self.voice_start[1:].tolist())
+        ]
+        self.Envelops = [np.array(self.envelop_data[begin: end]) for begin, end in zip(self.envelop_start[:-1].tolist(), self.envelop_start[1:].tolist())]
+        self.Slides = [np.array(self.slide_data[begin: end]) for begin, end in zip(self.slide_start[:-1].tolist(), self.slide_start[1:].tolist())]
+        # First frequency of every note
+        self.freq_start = np.zeros(self.notes.size + 1, np.int64)
+        np.cumsum(self.notes['freq_count'], out=self.freq_start[1:])
+
+    def TrackNotes(self, TrackNameIndex: int):
+        return self.notes[self.track_start[TrackNameIndex]: self.track_start[TrackNameIndex + 1]]
+
+    def TrackPlan(self, TrackNameIndex: int):
+        # Offset and length of every note of a track.
+        NoteLength = self.TrackNotes(TrackNameIndex)['length'].astype(np.int64)
+        NoteOffset = np.zeros(NoteLength.size, np.int64)
+        np.cumsum(NoteLength[:-1], out=NoteOffset[1:])
+        return NoteOffset, NoteLength
+
+    def NoteArgs(self, TrackNameIndex: int, window_size: int, offset_of_window: int, sr: int, first: int = 0, last: int | None = None) -> Iterator[tuple]:
+        # Same as `SaikoSynthesizer.GetNote` for every note of a track (or the notes `first` to `last` of it).
+        begin, end = int(self.track_start[TrackNameIndex]), int(self.track_start[TrackNameIndex + 1])
+        begin, end = begin + first, end if last is None else begin + last
+        notes = self.notes[begin: end]
+        freqs = self.freqs[self.freq_start[begin]: self.freq_start[end]].tolist()
+        freq_start = (self.freq_start[begin: end + 1] - self.freq_start[begin]).tolist()
+        block_num = (notes['length'] // (window_size // offset_of_window) + 1).tolist()
+        for index, (length, volume, voice, envelop, slide) in enumerate(zip(
+            notes['length'].tolist(), notes['volume'].tolist(), notes['voice'].tolist(), notes['envelop'].tolist(), notes['slide'].tolist()
+        )):
+            yield (
+                length, freqs[freq_start[index]: freq_start[index + 1]], self.Voices[voice], volume,
+                self.Envelops[envelop], self.Slides[slide], window_size, block_num[index], offset_of_window, sr
+            )
+
+class _Interner(object):
+    # Index of every distinct value, in the order they are first seen.
+    def __init__(self):
+        self.index: dict[Any, int] = {}
+        self.values: list[Any] = []
+
+    def __call__(self, key: Any, value: Any):
+        if key not in self.index:
+            self.index[key] = len(self.values)
+            self.values.append(value)
+        return self.index[key]
+
+def _Column(Notes: list[dict[str, Any]], key: str, default: Any):
+    return [Note.get(key, default) for Note in Notes]
+
+def _NoteLength(Notes: list[dict[str, Any]], BeatPerMinute: float | None, SampleRate: int):
+    # Same as the note length of `SaikoSynthesizer.GetNote`, for a whole track.
+    nan = float('nan')
+    length = np.array(_Column(Notes, 'length', nan), np.float64)
+    delay = np.array(_Column(Notes, 'delay', nan), np.float64)
+    has_length = ~np.isnan(length)
+    if BeatPerMinute is None:
+        NoteLength = np.where(has_length, length, np.trunc(np.nan_to_num(delay) * SampleRate))
+    else:
+        beat = np.array(_Column(Notes, 'beat', nan), np.float64)
+        NoteLength = np.where(
+            has_length, length, np.where(~np.isnan(beat), np.trunc(beat * BeatPerMinute), np.where(~np.isnan(delay), np.trunc(delay * SampleRate), 0.0))
+        )
+    return np.trunc(NoteLength).astype(np.int64)
+
+def ResolveSheet(synth: Any):
+    # Resolve every note of a `SaikoSynthesizer` into a `NoteTable`.
+    # Named voices, envelops and slides (and pitch names) are converted once for the whole sheet.
+    voices, envelops, slides = _Interner(), _Interner(), _Interner()
+    for name in synth.VoiceDict:
+        voices(synth.VoiceDict[name], name)
+    # name or inline list -> id
+    envelop_id: dict[Any, int] = {}
+    slide_id: dict[Any, int] = {}
+    pitch_freq: dict[str, float] = {}
+    def EnvelopId(note_envelop: str | list[float]):
+        key = note_envelop if isinstance(note_envelop, str) else tuple(note_envelop)
+        if key not in envelop_id:
+            if isinstance(note_envelop, str):
+                note_envelop = synth.EnvelopDict.get(note_envelop, synth.EnvelopDict['default'])
+            envelop = np.array(note_envelop, np.float32)
+            envelop_id[key] = envelops(envelop.tobytes(), envelop)
+        return envelop_id[key]
+    def SlideId(note_slide: str | list[float]):
+        key = note_slide if isinstance(note_slide, str) else tuple(note_slide)
+        if key not in slide_id:
+            if isinstance(note_slide, str):
+                note_slide = synth.SlideDict.get(note_slide, synth.SlideDict['default'])
+            slide = np.power(2, np.array(note_slide, np.float32) / 12)
+            slide_id[key] = slides(slide.tobytes(), slide)
+        return slide_id[key]
+    def PitchFreq(pitch: str):
+        if pitch not in pitch_freq:
+            pitch_freq[pitch] = synth.A4_Frequency * 2 ** (PITCH[pitch] / 12)
+        return pitch_freq[pitch]
+    voice_id = {name: voices.index[synth.VoiceDict[name]] for name in synth.VoiceDict}
+    none_voice = voice_id['none']
+    tracks: list[np.ndarray] = []
+    freqs: list[float] = []
+    track_start = [0]
+    for TrackName in synth.TrackNameList:
+        Notes, local_track = synth.GetTrack(TrackName)
+        track = np.zeros(len(Notes), NOTE_DTYPE)
+        track['length'] = _NoteLength(Notes, synth.BeatPerMinute, synth.SampleRate)
+        track['volume'] = _Column(Notes, 'volume', local_track.get('volume', synth.GlobalVolume))
+        track['voice'] = [voice_id.get(name, none_voice) for name in _Column(Notes, 'voice', local_track.get('voice', 'none'))]
+        track['envelop'] = [EnvelopId(envelop) for envelop in _Column(Notes, 'envelop', local_track.get('envelop', 'default'))]
+        track['slide'] = [SlideId(slide) for slide in _Column(Notes, 'slide', local_track.get('slide', 'default'))]
+        chords = [Note['freqs'] if 'freqs' in Note else [PitchFreq(pitch) for pitch in Note.get('pitchs', [])] for Note in Notes]
+        track['freq_count'] = [len(chord) for chord in chords]
+        for chord in chords:
+            freqs.extend(chord)
+        tracks.append(track)
+        track_start.append(track_start[-1] + len(Notes))
+    voice_list = list(voices.index)
+    return NoteTable({
+        'notes': np.concatenate(tracks) if tracks else np.zeros(0, NOTE_DTYPE),
+        'track_start': np.array(track_start, np.int64),
+        'freqs': np.array(freqs, np.float64),
+        'partials': np.array([partial for voice in voice_list for partial in voice], PARTIAL_DTYPE),
+        'voice_start': np.cumsum([0] + [len(voice) for voice in voice_list]).astype(np.int64),
+        'envelop_data': np.concatenate(envelops.values).astype(np.float32) if envelops.values else np.zeros(0, np.float32),
+        'envelop_start': np.cumsum([0] + [envelop.size for envelop in envelops.values]).astype(np.int64),
+        'slide_data': np.concatenate(slides.values).astype(np.float32) if slides.values else np.zeros(0, np.float32),
+        'slide_start': np.cumsum([0] + [slide.size for slide in slides.values]).astype(np.int64),
+    }, list(synth.TrackNameList), [name if name is not None else '?' for name in voices.values])
+
+def SourceState(path: str, with_hash: bool = True):
+    stat = os.stat(path)
+    state: dict[str, Any] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    if with_hash:
+        with open(path, 'rb') as f:
+            state['blake2b'] = blake2b(f.read(), digest_size=16).hexdigest()
+    return state
+
+def SaveTable(path: str, table: NoteTable, sksheet: dict[str, Any], source: dict[str, Any], engine_version: str):
+    # sksheet: the sheet without `Sheet` (its notes are in the table)
+    header: dict[str, Any] = {
+        'version': SKBIN_VERSION,
+        'saiko': engine_version,
+        'source': source,
+        'sksheet': sksheet,
+        'tracks': table.track_names,
+        'voices': table.voice_names,
+        'arrays': {},
+    }
+    position = 0
+    for name in NoteTable.ARRAYS:
+        array: np.ndarray = getattr(table, name)
+        header['arrays'][name] = {'dtype': array.dtype.descr if array.dtype.names else array.dtype.str, 'shape': list(array.shape), 'offset': position}
+        position += -(-array.nbytes // SKBIN_ALIGN) * SKBIN_ALIGN
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(SKBIN_MAGIC) + 8 + len(header_bytes)) // SKBIN_ALIGN) * SKBIN_ALIGN
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(SKBIN_MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+        for name in NoteTable.ARRAYS:
+            array = getattr(table, name)
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+    os.replace(temp_path, path)
+
+def ReadHeader(path: str):
+    with open(path, 'rb') as f:
+        if f.read(len(SKBIN_MAGIC)) != SKBIN_MAGIC:
+            raise ValueError('Not a compiled Saiko sheet: ' + path)
+        header_length, = struct.unpack('<Q', f.read(8))
+        if header_length > os.fstat(f.fileno()).st_size - f.tell():
+            raise ValueError('Truncated compiled Saiko sheet: ' + path)
+        header: dict[str, Any] = json.loads(f.read(header_length).decode('utf-8'))
+    header['data_start'] = -(-(len(SKBIN_MAGIC) + 8 + header_length) // SKBIN_ALIGN) * SKBIN_ALIGN
+    return header
+
+def LoadTable(path: str, header: dict[str, Any] | None = None):
+    # The arrays are memory-mapped, nothing is parsed per note.
+    if header is None:
+        header = ReadHeader(path)
+    arrays: dict[str, np.ndarray] = {}
+    for name, item in header['arrays'].items():
+        dtype = np.dtype([tuple(field) for field in item['dtype']]) if isinstance(item['dtype'], list) else np.dtype(item['dtype'])
+        shape = tuple(item['shape'])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype, 'r', header['data_start'] + item['offset'], shape)
+    return NoteTable(arrays, header['tracks'], header['voices'])
+
+def IsFresh(header: dict[str, Any], source_path: str, engine_version: str):
+    # Whether a compiled sheet still matches its source (mtime and size first, then the content hash).
+    if header.get('version') != SKBIN_VERSION or header.get('saiko') != engine_version:
+        return False
+    state = SourceState(source_path, with_hash=False)
+    source = header.get('source', {})
+    if state['mtime_ns'] == source.get('mtime_ns') and state['size'] == source.get('size'):
+        return True
+    return SourceState(source_path)['blake2b'] == source.get('blake2b')
@@ -17,8 +17,9 @@
 import sys
 sys.path.append('.')
 
-import os, json, time, struct
+import os, json, time, struct, threading
 import numpy as np
+import soundfile as sf
 from hashlib import blake2s
 from typing import Any, Callable
 
@@ -27,15 +28,23 @@ from tkinter import filedialog
 import tkinter.messagebox
 
 from Saiko4.Ver import SAIKO_VERSION
+from Saiko4.Playback import DefaultSink, Player
 import Saiko4.SheetV2 as SaikoSynthesizer
+from Saiko4GUI.Preview import PreviewClient
 
 SKSHEET_EDITOR_VERSION:str = '0.0.1'
+# Interval of polling the preview worker in ms
+PREVIEW_POLL_INTERVAL: int = 50
 
 class EditorMain(object):
     def __init__(self):
         # File And Data
         self.opened_file: str = 'temp/untitled-' + blake2s(struct.pack('d', time.time()), digest_size=4).hexdigest() + '.sksheet'
         self.sksheet: dict[str, Any] = {}
+        # Preview (rendered by a worker process, played on a thread)
+        self.preview = PreviewClient()
+        self.preview_polling = False
+        self.player: Player | None = None
         # Root Widget
         self.root = tk.Tk()
         self.root.title(f'Saiko Sheet Editor {SKSHEET_EDITOR_VERSION} (Saiko {SAIKO_VERSION}) [{self.opened_file}]')
@@ -45,6 +54,9 @@ class EditorMain(object):
         self.Menu()
         self.FileMenu()
         self.SynthMenu()
+        # Status Bar
+        self.status = tk.Label(self.root, text='Ready.', anchor='w')
+        self.status.pack(side='bottom', fill='x')
         # Others
         self.root.config(menu=self.menu)
 
@@ -62,7 +74,9 @@ class EditorMain(object):
     def SynthMenu(self):
         self.synth_menu = tk.Menu(self.menu, tearoff=False)
         self.synth_menu.add_command(label='Option', command=self.__SynthOptCB)
-        #self.synth_menu.add_command(label='Synth', command=)
+        self.synth_menu.add_command(label='Preview', command=self.__PreviewCB)
+        self.synth_menu.add_command(label='Preview Selection', command=self.__PreviewSelectionCB)
+        self.synth_menu.add_command(label='Stop Preview', command=self.__StopPreviewCB)
         self.menu.add_cascade(label='Synth', menu=self.synth_menu)
 
     def __OpenFileCB(self):
@@ -104,8 +118,97 @@ class EditorMain(object):
         so_root.mainloop()
 
 
+    def Preview(self, tracks: list[int] | None = None, begin: float = 0.0, end: float | None = None):
+        # Renders the tracks (all if None) from `begin` to `end` seconds in the worker, and plays them when they are done.
+        if len(self.sksheet.get('Sheet', {})) == 0:
+            tkinter.messagebox.showerror('Saiko Sheet Editor Error', 'Error: Nothing To Preview.')
+            return
+        self.StopPlaying()
+        self.preview.Submit(self.sksheet, tracks, begin, end)
+        self.status.config(text='Rendering Preview...')
+        if not self.preview_polling:
+            self.preview_polling = True
+            self.root.after(PREVIEW_POLL_INTERVAL, self.__PollPreview)
+
+    def PlayPreview(self, samples: np.ndarray, sr: int):
+        sink = DefaultSink()
+        if sink is None:
+            # No sound device, saved next to the sheet instead.
+            path = os.path.splitext(self.opened_file)[0] + '.preview.wav'
+            sf.write(path, samples, sr)
+            self.status.config(text=f'Preview Saved To {path} (`sounddevice` Is Not Available).')
+            return
+        self.player = Player(iter([samples]), sr, sink)
+        threading.Thread(target=self.player.Play, name='Saiko-Preview-Play', daemon=True).start()
+        self.status.config(text='Playing Preview ({:.2f}s).'.format(samples.size / sr))
+
+    def StopPlaying(self):
+        if self.player is not None:
+            self.player.Stop()
+            self.player = None
+
+    def __PollPreview(self):
+        for event in self.preview.Poll():
+            if event[0] == 'progress':
+                self.status.config(text='Rendering Preview... {}/{} Notes'.format(event[2], event[3]))
+            elif event[0] == 'done':
+                self.PlayPreview(event[2], event[3])
+            elif event[0] == 'cached':
+                # The rest of the sheet is in the note cache of the worker now.
+                self.preview_polling = False
+            elif event[0] == 'cancelled':
+                self.status.config(text='Preview Cancelled.')
+                self.preview_polling = False
+            elif event[0] == 'error':
+                self.status.config(text='Preview Failed.')
+                tkinter.messagebox.showerror('Saiko Sheet Editor Error', 'Error: ' + event[2])
+                self.preview_polling = False
+        if self.preview_polling:
+            self.root.after(PREVIEW_POLL_INTERVAL, self.__PollPreview)
+
+    def __PreviewCB(self):
+        self.Preview()
+
+    def __StopPreviewCB(self):
+        self.preview.Cancel()
+        self.StopPlaying()
+
+    def __PreviewSelectionCB(self):
+        ps_root = tk.Toplevel(self.root)
+        ps_root.title('Preview Selection')
+        ps_root.geometry('400x300')
+        track_names = list(self.sksheet.get('Sheet', {}))
+        # Tracks (all if none is selected)
+        tk.Label(ps_root, text='Tracks').place(relheight=20/300, relwidth=90/400, relx=10/400, rely=7.5/300)
+        track_list = tk.Listbox(ps_root, selectmode='multiple', exportselection=False)
+        track_list.place(relheight=180/300, relwidth=280/400, relx=110/400, rely=7.5/300)
+        for name in track_names:
+            track_list.insert('end', name)
+        # Seconds
+        tk.Label(ps_root, text='From (s)').place(relheight=20/300, relwidth=90/400, relx=10/400, rely=195/300)
+        begin_input = tk.Entry(ps_root)
+        begin_input.place(relheight=20/300, relwidth=90/400, relx=110/400, rely=195/300)
+        begin_input.insert(0, '0')
+        tk.Label(ps_root, text='To (s)').place(relheight=20/300, relwidth=90/400, relx=10/400, rely=222.5/300)
+        end_input = tk.Entry(ps_root)
+        end_input.place(relheight=20/300, relwidth=90/400, relx=110/400, rely=222.5/300)
+        def PreviewCB():
+            try:
+                begin = float(begin_input.get() or 0)
+                end = float(end_input.get()) if end_input.get().strip() else None
+            except ValueError:
+                tkinter.messagebox.showerror('Saiko Sheet Editor Error', 'Error: Bad Time Range.', parent=ps_root)
+                return
+            self.Preview(list(track_list.curselection()) or None, begin, end)
+        tk.Button(ps_root, text='Preview', command=PreviewCB).place(relheight=30/300, relwidth=90/400, relx=110/400, rely=255/300)
+        tk.Button(ps_root, text='Stop', command=self.__StopPreviewCB).place(relheight=30/300, relwidth=90/400, relx=210/400, rely=255/300)
+
     def __call__(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.StopPlaying()
+            self.preview.Close()
 
 if __name__ == '__main__':
     Editor = EditorMain()
@@ -0,0 +1,193 @@
+#   Copyright 2024 Qiong-Mengzi
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+
+# Preview Rendering
+#
+# A worker process renders previews of the sheet of the editor, so the Tk loop never waits for the synthesizer.
+# The editor polls the events of the worker (see `PreviewClient.Poll`) from `after()`.
+# The note cache of the worker is kept across previews, so only the changed notes of a sheet are synthesized again.
+
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import time
+import traceback
+from typing import Any
+import numpy as np
+
+from Saiko4.Cache import NoteCache
+from Saiko4.SheetV2 import PROGRESS_INTERVAL, SaikoSynthesizer
+from Saiko4.Synth import SynthTables
+
+def _Cancelled(job: dict[str, Any], cancel: Any, requests: Any):
+    # A job stops when it is cancelled (`cancel` is the last cancelled job) or a newer job is waiting.
+    return cancel.value >= job['id'] or not requests.empty()
+
+def _NoteRanges(synth: SaikoSynthesizer, tracks: list[int], begin: int, end: int):
+    # (track, first, last) of the notes of `tracks` sounding in the samples `begin` to `end`.
+    ranges: list[tuple[int, int, int]] = []
+    for TrackNameIndex in tracks:
+        NoteOffset, NoteLength = synth.PlanTrack(TrackNameIndex)
+        first = int(np.searchsorted(NoteOffset + NoteLength, begin, 'right'))
+        last = int(np.searchsorted(NoteOffset, end, 'left'))
+        if last > first:
+            ranges.append((TrackNameIndex, first, last))
+    return ranges
+
+def _RenderPreview(synth: SaikoSynthesizer, job: dict[str, Any], events: Any, cancel: Any, requests: Any):
+    # The selected tracks in the selected seconds, normalized. None if cancelled.
+    TrackCount = len(synth.TrackNameList)
+    tracks = [index for index in job['tracks'] if 0 <= index < TrackCount] if job['tracks'] is not None else list(range(TrackCount))
+    length = max([synth.GetTrackLength(TrackNameIndex) for TrackNameIndex in tracks], default=0)
+    begin = min(int(job['begin'] * synth.SampleRate), length)
+    end = length if job['end'] is None else min(max(int(job['end'] * synth.SampleRate), begin), length)
+    ranges = _NoteRanges(synth, tracks, begin, end)
+    total = sum(last - first for _, first, last in ranges)
+    done = 0
+    progress_time = 0.0
+    SoundResult = np.zeros(end - begin, np.float32)
+    for TrackNameIndex, first, last in ranges:
+        NoteOffset = synth.PlanTrack(TrackNameIndex)[0]
+        for NoteIndex, NoteArg in enumerate(synth.TrackNoteArgs(TrackNameIndex, first, last), first):
+            if _Cancelled(job, cancel, requests):
+                return None
+            NoteResult = synth.SynthNoteArg(NoteArg)
+            # The part of the note in the selection
+            position = int(NoteOffset[NoteIndex])
+            head, tail = max(position, begin), min(position + NoteResult.size, end)
+            if tail > head:
+                SoundResult[head - begin: tail - begin] += NoteResult[head - position: tail - position]
+            done += 1
+            now = time.perf_counter()
+            if now - progress_time >= PROGRESS_INTERVAL:
+                progress_time = now
+                events.put(('progress', job['id'], done, total))
+    return synth.NormSound(SoundResult)
+
+def _WarmCache(synth: SaikoSynthesizer, job: dict[str, Any], cancel: Any, requests: Any):
+    # Every other note of the sheet goes to the note cache, so the next previews start at once.
+    for TrackNameIndex in range(len(synth.TrackNameList)):
+        for NoteArg in synth.TrackNoteArgs(TrackNameIndex):
+            if _Cancelled(job, cancel, requests):
+                return False
+            synth.SynthNoteArg(NoteArg)
+    return True
+
+def _PreviewWorker(requests: Any, events: Any, cancel: Any, cache_size: int):
+    # Jobs come from `requests` (None to exit), events go to `events`:
+    #   ('progress', id, notes done, notes), ('done', id, samples, sr), ('cancelled', id), ('error', id, message), ('cached', id, note cache stats)
+    cache = NoteCache(cache_size)
+    tables = SynthTables()
+    work_dir = tempfile.mkdtemp(prefix='saiko-preview-')
+    try:
+        while True:
+            job = requests.get()
+            if job is None:
+                break
+            # Only the newest job is rendered.
+            while not requests.empty():
+                try:
+                    newer = requests.get_nowait()
+                except queue.Empty:
+                    break
+                if newer is None:
+                    return
+                events.put(('cancelled', job['id']))
+                job = newer
+            try:
+                project_name = os.path.join(work_dir, 'preview')
+                with open(project_name + '.sksheet', 'w', encoding='utf-8') as f:
+                    json.dump(job['sksheet'], f)
+                synth = SaikoSynthesizer(project_name, cache_size=0, **job['options'])
+                synth.NoteCache = cache
+                synth.Tables = tables
+                SoundResult = _RenderPreview(synth, job, events, cancel, requests)
+                if SoundResult is None:
+                    events.put(('cancelled', job['id']))
+                    continue
+                events.put(('done', job['id'], SoundResult, synth.SampleRate))
+                if job['warm']:
+                    if _WarmCache(synth, job, cancel, requests):
+                        events.put(('cached', job['id'], cache.Stats()))
+                    else:
+                        events.put(('cancelled', job['id']))
+            except Exception as error:
+                events.put(('error', job['id'], '{}: {}\n{}'.format(type(error).__name__, error, traceback.format_exc())))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+class PreviewClient(object):
+    # The editor side of the preview worker (started with the first job).
+    #   cache_size: memory budget of the note cache of the worker in bytes
+    def __init__(self, cache_size: int = 256 << 20):
+        self.cache_size = cache_size
+        # Tk is not safe to fork, so the worker is spawned.
+        self.context = multiprocessing.get_context('spawn')
+        self.process: Any = None
+        self.next_id = 1
+        # The last submitted job, events of older ones are dropped by `Poll`.
+        self.job_id = 0
+
+    def Start(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.requests = self.context.Queue()
+        self.events = self.context.Queue()
+        self.cancel = self.context.Value('q', 0)
+        self.process = self.context.Process(target=_PreviewWorker, args=(self.requests, self.events, self.cancel, self.cache_size), name='Saiko-Preview', daemon=True)
+        self.process.start()
+
+    def Submit(self, sksheet: dict[str, Any], tracks: list[int] | None = None, begin: float = 0.0, end: float | None = None, warm: bool = True, **options: Any):
+        # Renders the tracks `tracks` (all if None) from `begin` to `end` seconds (the end if None), the job before is dropped.
+        # If `warm`, the rest of the sheet is rendered into the note cache afterwards (until the next job).
+        # `options` are passed to `SaikoSynthesizer` (`engine`, `precision` ...).
+        self.Start()
+        job_id = self.next_id
+        self.next_id += 1
+        self.job_id = job_id
+        self.requests.put({'id': job_id, 'sksheet': sksheet, 'tracks': tracks, 'begin': begin, 'end': end, 'warm': warm, 'options': options})
+        return job_id
+
+    def Cancel(self):
+        if self.process is not None:
+            self.cancel.value = self.job_id
+
+    def Poll(self):
+        # Events of the last job so far (never blocks).
+        result: list[tuple] = []
+        if self.process is None:
+            return result
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[1] == self.job_id:
+                result.append(event)
+        if len(result) == 0 and not self.process.is_alive():
+            result.append(('error', self.job_id, 'The preview worker exited.'))
+            self.process = None
+        return result
+
+    def Close(self):
+        if self.process is not None:
+            self.cancel.value = self.job_id
+            self.requests.put(None)
+            self.process.join(1.0)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
@@ -0,0 +1,98 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Synthetic Saiko Sheet Generator
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import random
+from typing import Any
+
+from Saiko4.pitch import PITCH
+from Saiko4.Ver import SAIKO_VERSION
+
+def GenerateSheet(
+    notes: int = 200,
+    chord: int = 1,
+    partials: int = 4,
+    window_length: int = 320,
+    offset: int = 4,
+    sr: int = 64000,
+    tracks: int = 1,
+    delay: float = 0.25,
+    seed: int = 0
+):
+    # `notes` notes of `delay` seconds in each of `tracks` tracks, every note is a chord of `chord` pitches.
+    rng = random.Random(seed)
+    PitchNames = [name for name in PITCH if -24 <= PITCH[name] <= 12]
+    sksheet: dict[str, Any] = {
+        'Saiko': SAIKO_VERSION,
+        'Voice': {
+            'bench': {str(float(index + 1)): str(complex(round(0.5 / (index + 1), 6), round(0.25 / (index + 1), 6))) for index in range(partials)},
+        },
+        'A4': 440,
+        'sr': sr,
+        'volume': 0.8,
+        'envelop': {
+            'default': [0.8, 1.0, 1.0, 0.8, 0.5, 0.2, 0.0],
+            'pluck': [1.0, 0.5, 0.25, 0.1, 0.0],
+        },
+        'slide': {
+            'bend': [-1, -0.5, 0, 0, 0],
+        },
+        'Synth': {
+            'window-length': window_length,
+            'norm': True,
+            'offset': offset,
+        },
+        'PCM': 'PCM_16',
+        'Sheet': {},
+    }
+    for track_index in range(tracks):
+        track: list[dict[str, Any]] = []
+        for _ in range(notes):
+            note: dict[str, Any] = {'voice': 'bench', 'pitchs': rng.sample(PitchNames, chord), 'delay': delay}
+            style = rng.random()
+            if style < 0.25:
+                note['envelop'] = 'pluck'
+            elif style < 0.375:
+                note['slide'] = 'bend'
+            track.append(note)
+        sksheet['Sheet']['Track-{}'.format(track_index)] = track
+    return sksheet
+
+def WriteSheet(project_name: str, **kwargs: Any):
+    sksheet = GenerateSheet(**kwargs)
+    with open(project_name + '.sksheet', 'w', encoding='utf-8') as f:
+        json.dump(sksheet, f, indent=1)
+    return sksheet
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python benchmarks/generate.py', description='Generate a synthetic Saiko sheet')
+    parser.add_argument('project', help='output file name without suffix name')
+    parser.add_argument('--notes', type=int, default=200, help='notes per track')
+    parser.add_argument('--chord', type=int, default=1, help='pitches per note')
+    parser.add_argument('--partials', type=int, default=4, help='partials of the voice')
+    parser.add_argument('--window-length', type=int, default=320)
+    parser.add_argument('--offset', type=int, default=4)
+    parser.add_argument('--sr', type=int, default=64000)
+    parser.add_argument('--tracks', type=int, default=1)
+    parser.add_argument('--delay', type=float, default=0.25, help='length of a note in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    args = vars(parser.parse_args())
+    WriteSheet(args.pop('project'), **args)
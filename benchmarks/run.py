@@ -0,0 +1,337 @@
+#  Copyright 2024 Qiong-Mengzi
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Benchmark Runner
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import platform
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+import numpy as np
+
+from benchmarks.generate import WriteSheet
+from Saiko4.SheetV2 import SaikoSynthesizer
+from Saiko4.Synth import FFT_ERROR, OSCILLATOR_ENGINES, OSCILLATOR_ERROR, OSCILLATORS, PRECISIONS, SYNTH_ENGINE, RotationOscillator, SynthesisChord, SynthesisChordFFT, SynthesisNote, SynthThreadV2, SynthThreadV2Loop
+from Saiko4.Ver import SAIKO_VERSION
+
+# Workloads (arguments of `GenerateSheet`)
+BENCHMARK_CASES: dict[str, dict[str, Any]] = {
+    'melody': {'notes': 200},
+    'chord': {'notes': 100, 'chord': 3, 'partials': 8},
+    'rich-voice': {'notes': 50, 'partials': 32},
+    'multi-track': {'notes': 50, 'chord': 2, 'tracks': 4},
+    'fine-hop': {'notes': 100, 'offset': 8},
+    'low-sr': {'notes': 200, 'sr': 32000},
+    'short-notes': {'notes': 2000, 'delay': 0.02},
+}
+
+# Max-abs difference allowed between two paths that should give the same samples.
+EQUIVALENCE_TOLERANCE: dict[str, float] = {
+    'SynthThreadV2/SynthThreadV2Loop': 0.0,
+    'oscillator exact/rotation': OSCILLATOR_ERROR,
+    # A few float32 roundings of the samples
+    'float32/float64': 1e-5,
+    'istft/fft': FFT_ERROR,
+    'full/incremental': 0.0,
+    'full/incremental reordered': 0.0,
+    'full/incremental renamed': 0.0,
+}
+
+# `max_error` values of `RotationOscillator` checked by `OscillatorSweep`
+# (under about 1e-8 the float64 phases of long notes are not exact enough to check against).
+OSCILLATOR_SWEEP: tuple[float, ...] = (1e-3, 1e-4, 1e-5, 1e-6, 1e-7)
+
+def PeakRSS():
+    # Peak resident set size of this process in MiB (None if unknown).
+    try:
+        with open('/proc/self/status', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / (1 << 10)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+def ResetPeakRSS():
+    # Starts a new peak of `PeakRSS` at the current RSS (Linux only) and returns it, the peak of a case is measured from here.
+    # Elsewhere the peak can not be reset, only a case that goes over the peak so far is measured.
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='utf-8') as f:
+            f.write('5')
+    except OSError:
+        pass
+    return PeakRSS()
+
+def BestTime(func: Callable[[], Any], repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def FirstNoteArg(synth: SaikoSynthesizer):
+    # Resolved arguments of the first note with pitches.
+    for TrackNameIndex in range(len(synth.TrackNameList)):
+        for NoteArg in synth.TrackNoteArgs(TrackNameIndex):
+            if len(NoteArg[1]) > 0:
+                return NoteArg
+    return None
+
+def ThreadArg(NoteArg: tuple):
+    # Arguments of `SynthThreadV2` for the first partial of a note.
+    NoteLength, freqs, voice, volume, envelop, slide, window_size, block_num, offset_of_window, sr = NoteArg
+    return (freqs[0] * voice[0][0], voice[0][1], window_size, window_size // offset_of_window, block_num, volume, envelop, slide, sr)
+
+def OscillatorError(NoteArg: tuple, max_error: float = OSCILLATOR_ERROR):
+    # Max deviation of `RotationOscillator` from np.cos / np.sin over every hop of every partial of a note (relative to the amplitudes).
+    NoteLength, freqs, voice, volume, envelop, slide, window_size, block_num, offset_of_window, sr = NoteArg
+    each_offset = window_size // offset_of_window
+    real_freq = np.interp(np.arange(block_num) / block_num * slide.size, np.arange(slide.size), slide).astype(np.float32) * np.array([freq * v[0] for freq in freqs for v in voice], np.float32)[:, None]
+    Amps = np.array([v[1] for _ in freqs for v in voice])[:, None, None]
+    offset = np.arange(1, block_num + 1)
+    phase = 2 * np.pi / sr * (np.arange(window_size) + offset[:, None] * each_offset) * real_freq[:, :, None]
+    exact = Amps.real * np.cos(phase) + Amps.imag * np.sin(phase)
+    rotation = RotationOscillator(2 * np.pi / sr * real_freq[:, :, None].astype(np.float64), offset * each_offset, Amps, window_size, max_error)
+    return float(np.max(np.abs(rotation - exact) / np.abs(Amps), initial=0.0))
+
+def OscillatorSweep(max_errors: tuple[float, ...] = OSCILLATOR_SWEEP, sr: int = 64000, window_size: int = 1280, hops: int = 64, partials: int = 48, seed: int = 0):
+    # Max deviation of `RotationOscillator` from np.cos / np.sin (relative to the amplitudes) for every `max_error`,
+    # with partials from 20 Hz to the Nyquist, sliding frequencies and hops up to 10 minutes into a note.
+    rng = np.random.default_rng(seed)
+    freqs = np.geomspace(20.0, sr / 2, partials)
+    omega = (2 * np.pi / sr * freqs[:, None] * rng.uniform(0.5, 1.0, (partials, hops)))[:, :, None]
+    start = np.sort(rng.integers(0, 600 * sr, hops))
+    Amps = (rng.uniform(-1, 1, partials) + 1j * rng.uniform(-1, 1, partials))[:, None, None]
+    phase = omega * (np.arange(window_size) + start[:, None])
+    exact = Amps.real * np.cos(phase) + Amps.imag * np.sin(phase)
+    errors: dict[str, float] = {}
+    for max_error in max_errors:
+        rotation = RotationOscillator(omega, start, Amps, window_size, max_error)
+        errors['{:g}'.format(max_error)] = float(np.max(np.abs(rotation - exact) / np.abs(Amps)))
+    return errors
+
+def NyquistCheck(sr: int = 44100, windows: tuple[int, ...] = (320, 322, 998, 999, 1000), block_num: int = 30, offset_of_window: int = 5):
+    # Max-abs difference of the `fft` engine from `SynthesisChord` for partials of amplitude 1 at 0 Hz, at the Nyquist frequency and next to them
+    # (there a partial and its mirror share bins).
+    freqs = [0.0, 1.0, sr / 2 - 1.0, sr / 2]
+    voice = ((1.0, 1 + 0j), (1.0, 0.6 + 0.8j))
+    envelop = np.ones(2, np.float32)
+    slide = np.ones(2, np.float32)
+    diff = 0.0
+    for window_size in windows:
+        for partial in voice:
+            result = SynthesisChordFFT(freqs, (partial, ), 1.0, envelop, slide, window_size, block_num, offset_of_window, sr)
+            reference = SynthesisChord(freqs, (partial, ), 1.0, envelop, slide, window_size, block_num, offset_of_window, sr)
+            diff = max(diff, float(np.max(np.abs(result - reference))))
+    return {'istft/fft': diff}
+
+def RunCase(name: str, params: dict[str, Any], engine: str = 'istft', repeat: int = 3, oscillator: str = 'exact', precision: str = 'float32'):
+    base_rss = ResetPeakRSS()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_name = os.path.join(temp_dir, name)
+        WriteSheet(project_name, **params)
+        stages: dict[str, float] = {}
+        start = time.perf_counter()
+        synth = SaikoSynthesizer(project_name, engine=engine, cache_size=0, oscillator=oscillator, precision=precision)
+        stages['OpenSkSheet'] = time.perf_counter() - start
+        NoteArg = FirstNoteArg(synth)
+        if NoteArg is not None:
+            stages['SynthThreadV2'] = BestTime(lambda: SynthThreadV2(*ThreadArg(NoteArg)), repeat)
+            stages['SynthesisNote'] = BestTime(lambda: SynthesisNote(NoteArg[1][0], *NoteArg[2:], **synth.EngineArgs), repeat)
+        # The whole sheet is only rendered once.
+        start = time.perf_counter()
+        tracks = synth.Synthesis()
+        stages['Synthesis'] = time.perf_counter() - start
+        start = time.perf_counter()
+        result = synth.RemixTracks(tracks)
+        stages['RemixTracks'] = time.perf_counter() - start
+    seconds = stages['Synthesis'] + stages['RemixTracks']
+    return {
+        'params': params,
+        'engine': engine,
+        'oscillator': synth.oscillator,
+        'precision': synth.precision,
+        'samples': int(result.size),
+        'audio_seconds': result.size / synth.SampleRate,
+        'seconds': seconds,
+        'samples_per_second': result.size / seconds if seconds > 0 else 0.0,
+        'stages': stages,
+        # Peak RSS over the RSS at the start of the case
+        'peak_rss_mb': None if base_rss is None else PeakRSS() - base_rss,
+    }
+
+def CheckIncremental(project_name: str, sksheet: dict[str, Any]):
+    # Max-abs difference between incremental and full renders, after the tracks of the sheet are reordered and renamed.
+    diff: dict[str, float] = {}
+    def Compare(pair: str):
+        result = SaikoSynthesizer(project_name, cache_size=0)(save=False, incremental=True)
+        reference = SaikoSynthesizer(project_name, cache_size=0)(save=False)
+        diff[pair] = float(np.max(np.abs(result - reference), initial=0.0))
+    Compare('full/incremental')
+    tracks = list(sksheet['Sheet'].items())
+    if len(tracks) > 1:
+        for pair, sheet in [
+            ('full/incremental reordered', dict(tracks[::-1])),
+            ('full/incremental renamed', {'{}-renamed'.format(tracks[-1][0]): tracks[-1][1], **dict(tracks[:-1])}),
+        ]:
+            with open(project_name + '.sksheet', 'w', encoding='utf-8') as f:
+                json.dump({**sksheet, 'Sheet': sheet}, f)
+            Compare(pair)
+    return diff
+
+def CheckEquivalence(name: str, params: dict[str, Any]):
+    # Max-abs difference between paths of the same workload.
+    with tempfile.TemporaryDirectory() as temp_dir:
+        project_name = os.path.join(temp_dir, name)
+        sksheet = WriteSheet(project_name, **params)
+        synth = SaikoSynthesizer(project_name, cache_size=0)
+        diff: dict[str, float] = {}
+        NoteArg = FirstNoteArg(synth)
+        if NoteArg is not None:
+            diff['SynthThreadV2/SynthThreadV2Loop'] = float(np.max(np.abs(SynthThreadV2(*ThreadArg(NoteArg)) - SynthThreadV2Loop(*ThreadArg(NoteArg))), initial=0.0))
+            diff['oscillator exact/rotation'] = OscillatorError(NoteArg)
+        reference = synth(save=False)
+        for engine in SYNTH_ENGINE:
+            if engine == synth.engine:
+                continue
+            result = SaikoSynthesizer(project_name, engine=engine, cache_size=0)(save=False)
+            diff['{}/{}'.format(synth.engine, engine)] = float(np.max(np.abs(result - reference), initial=0.0))
+        for oscillator in OSCILLATORS[1:]:
+            result = SaikoSynthesizer(project_name, cache_size=0, oscillator=oscillator)(save=False)
+            diff['{}/{}+{}'.format(synth.engine, synth.engine, oscillator)] = float(np.max(np.abs(result - reference), initial=0.0))
+        for precision in PRECISIONS:
+            if precision == synth.precision:
+                continue
+            result = SaikoSynthesizer(project_name, cache_size=0, precision=precision)(save=False)
+            diff['{}/{}'.format(synth.precision, precision)] = float(np.max(np.abs(result - reference), initial=0.0))
+        # Last, it rewrites the sheet.
+        diff.update(CheckIncremental(project_name, sksheet))
+    return diff
+
+def _RunIsolated(func: Callable[..., Any], *args: Any):
+    # A fresh process for every case, so a case does not run with the caches and freed memory of the cases before.
+    with ProcessPoolExecutor(1, max_tasks_per_child=1) as pool:
+        return pool.submit(func, *args).result()
+
+def RunBenchmarks(cases: dict[str, dict[str, Any]], engines: list[str], repeat: int = 3, scale: float = 1.0, equivalence: bool = True, show_detail: bool = True, oscillators: list[str] = ['exact'], precisions: list[str] = ['float32']):
+    results: dict[str, Any] = {
+        'saiko': SAIKO_VERSION,
+        'numpy': np.__version__,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cases': {},
+        'equivalence': {},
+        'oscillator': {},
+    }
+    if equivalence:
+        results['oscillator'] = OscillatorSweep()
+        results['equivalence']['nyquist'] = NyquistCheck()
+        if show_detail:
+            for max_error, error in results['oscillator'].items():
+                print('{:<24} max deviation {:<35} {:.3g}'.format('oscillator', 'max_error=' + max_error, error))
+            for pair, diff in results['equivalence']['nyquist'].items():
+                print('{:<24} max-abs diff {:<36} {:.3g}'.format('nyquist', pair, diff))
+    for name, params in cases.items():
+        params = dict(params)
+        params['notes'] = max(1, int(params.get('notes', 200) * scale))
+        for engine, oscillator, precision in [(engine, oscillator, precision) for engine in engines for oscillator in oscillators for precision in precisions]:
+            if oscillator != 'exact' and engine not in OSCILLATOR_ENGINES:
+                continue
+            key = '{}@{}'.format(name, engine) if oscillator == 'exact' else '{}@{}+{}'.format(name, engine, oscillator)
+            if precision != 'float32':
+                key += ':' + precision
+            results['cases'][key] = _RunIsolated(RunCase, name, params, engine, repeat, oscillator, precision)
+            if show_detail:
+                case = results['cases'][key]
+                print('{:<24} {:>12.0f} samples/s  ({:.2f}s audio in {:.2f}s, peak RSS +{} MiB)'.format(
+                    key, case['samples_per_second'], case['audio_seconds'], case['seconds'],
+                    '?' if case['peak_rss_mb'] is None else '{:.0f}'.format(case['peak_rss_mb'])))
+        if equivalence:
+            results['equivalence'][name] = _RunIsolated(CheckEquivalence, name, params)
+            if show_detail:
+                for pair, diff in results['equivalence'][name].items():
+                    print('{:<24} max-abs diff {:<36} {:.3g}'.format(name, pair, diff))
+    return results
+
+def CheckTolerance(results: dict[str, Any]):
+    # Equivalences of `results` broken by more than `EQUIVALENCE_TOLERANCE`, and oscillators over their `max_error`.
+    violations: list[str] = []
+    for name, diffs in results['equivalence'].items():
+        for pair, diff in diffs.items():
+            if pair in EQUIVALENCE_TOLERANCE and diff > EQUIVALENCE_TOLERANCE[pair]:
+                violations.append('{} <{}>: max-abs diff {:.3g} (tolerance {:.3g})'.format(name, pair, diff, EQUIVALENCE_TOLERANCE[pair]))
+    for max_error, error in results.get('oscillator', {}).items():
+        if error > float(max_error):
+            violations.append('oscillator <max_error={}>: max deviation {:.3g}'.format(max_error, error))
+    return violations
+
+def CompareBaseline(results: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.1):
+    # Regressions of `results` against `baseline` (slower by more than `threshold`).
+    regressions: list[str] = []
+    for key, case in results['cases'].items():
+        base = baseline.get('cases', {}).get(key)
+        if base is None:
+            continue
+        if case['samples_per_second'] < base['samples_per_second'] * (1 - threshold):
+            regressions.append('{}: {:.0f} samples/s (baseline {:.0f})'.format(key, case['samples_per_second'], base['samples_per_second']))
+        for stage, seconds in case['stages'].items():
+            base_seconds = base['stages'].get(stage)
+            if base_seconds is not None and seconds > base_seconds * (1 + threshold) and seconds - base_seconds > 1e-3:
+                regressions.append('{} <{}>: {:.4f}s (baseline {:.4f}s)'.format(key, stage, seconds, base_seconds))
+    return regressions
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(prog='python benchmarks/run.py', description='Saiko benchmarks')
+    parser.add_argument('--case', action='append', choices=list(BENCHMARK_CASES), help='workloads to run (default: all)')
+    parser.add_argument('--engine', action='append', choices=list(SYNTH_ENGINE), help='engines to run (default: istft)')
+    parser.add_argument('--oscillator', action='append', choices=list(OSCILLATORS), help='oscillators to run (default: exact)')
+    parser.add_argument('--precision', action='append', choices=list(PRECISIONS), help='precisions to run (default: float32)')
+    parser.add_argument('--repeat', type=int, default=3, help='repeats of the kernel stages (best is kept)')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale of the note counts')
+    parser.add_argument('--no-equivalence', action='store_true', help='skip the max-abs diff checks between paths')
+    parser.add_argument('--output', default=None, help='save the results as JSON')
+    parser.add_argument('--baseline', default=None, help='compare with the results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.1, help='allowed slowdown against the baseline (0.1 is 10%%)')
+    args = parser.parse_args()
+    cases = {name: BENCHMARK_CASES[name] for name in (args.case or BENCHMARK_CASES)}
+    results = RunBenchmarks(cases, args.engine or ['istft'], args.repeat, args.scale, not args.no_equivalence, oscillators=args.oscillator or ['exact'], precisions=args.precision or ['float32'])
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+    # Equivalences are checked on every run, the speed only against a baseline.
+    violations = CheckTolerance(results)
+    for violation in violations:
+        print('Out of tolerance: ' + violation)
+    regressions: list[str] = []
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = CompareBaseline(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if len(regressions) == 0:
+            print('No regression against {}.'.format(args.baseline))
+    sys.exit(1 if len(regressions) > 0 or len(violations) > 0 else 0)